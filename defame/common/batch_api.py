@@ -0,0 +1,178 @@
+"""Offline processing of LLM requests in the style of the OpenAI Batch API: The requests
+are written into a JSONL file which gets submitted as one job. Once the job is completed,
+the results are ingested. Much cheaper than individual calls, at the cost of latency."""
+
+import json
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable
+
+from openai import OpenAI
+
+from config.globals import api_keys, temp_dir
+from defame.common import logger
+
+DEFAULT_BATCH_DIR = temp_dir / "batches"
+
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchEndpoint(ABC):
+    """An API accepting JSONL files of (chat completion) requests as batch jobs."""
+
+    @abstractmethod
+    def submit(self, requests_path: Path) -> str:
+        """Submits the JSONL requests file as a new batch job. Returns the job's ID."""
+
+    @abstractmethod
+    def get_status(self, batch_id: str) -> str:
+        """Returns the status of the batch job, see TERMINAL_STATES for the final ones."""
+
+    @abstractmethod
+    def download_results(self, batch_id: str, results_path: Path):
+        """Saves the JSONL results (and errors) of the completed batch job."""
+
+
+class OpenAIBatchEndpoint(BatchEndpoint):
+    def __init__(self):
+        self.client = OpenAI(api_key=api_keys["openai_api_key"])
+
+    def submit(self, requests_path: Path) -> str:
+        with open(requests_path, "rb") as f:
+            requests_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=requests_file.id,
+                                           endpoint="/v1/chat/completions",
+                                           completion_window="24h")
+        return batch.id
+
+    def get_status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def download_results(self, batch_id: str, results_path: Path):
+        batch = self.client.batches.retrieve(batch_id)
+        with open(results_path, "wb") as f:
+            for file_id in [batch.output_file_id, batch.error_file_id]:
+                if file_id is not None:
+                    f.write(self.client.files.content(file_id).content)
+
+
+class LocalBatchEndpoint(BatchEndpoint):
+    """Stand-in for a batch API which processes the jobs locally in background
+    threads. Enables to test the batch flow offline."""
+
+    def __init__(self, respond: Callable[[dict], str] = None, processing_delay: float = 0):
+        """
+        @param respond: Maps a request body to the response text. Echoes the (text of
+            the) last message by default.
+        @param processing_delay: Seconds to wait before processing a job, simulating
+            the latency of a real batch API.
+        """
+        self.respond = respond or _echo
+        self.processing_delay = processing_delay
+        self._status: dict[str, str] = dict()
+        self._results: dict[str, list[dict]] = dict()
+
+    def submit(self, requests_path: Path) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        with open(requests_path) as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        self._status[batch_id] = "validating"
+        threading.Thread(target=self._process, args=(batch_id, requests), daemon=True).start()
+        return batch_id
+
+    def _process(self, batch_id: str, requests: list[dict]):
+        self._status[batch_id] = "in_progress"
+        time.sleep(self.processing_delay)
+        results = []
+        for request in requests:
+            result = dict(id=f"batch_req_{uuid.uuid4().hex}", custom_id=request["custom_id"],
+                          response=None, error=None)
+            try:
+                text = self.respond(request["body"])
+                result["response"] = dict(status_code=200, body=dict(
+                    object="chat.completion",
+                    model=request["body"].get("model"),
+                    choices=[dict(index=0, message=dict(role="assistant", content=text), finish_reason="stop")],
+                ))
+            except Exception as e:
+                result["error"] = dict(code="local_error", message=str(e))
+            results.append(result)
+        self._results[batch_id] = results
+        self._status[batch_id] = "completed"
+
+    def get_status(self, batch_id: str) -> str:
+        return self._status[batch_id]
+
+    def download_results(self, batch_id: str, results_path: Path):
+        with open(results_path, "w") as f:
+            for result in self._results.pop(batch_id):
+                f.write(json.dumps(result) + "\n")
+
+
+def _echo(body: dict) -> str:
+    content = body["messages"][-1]["content"]
+    if isinstance(content, list):
+        content = " ".join(part["text"] for part in content if part["type"] == "text")
+    return content
+
+
+BATCH_ENDPOINTS = {
+    "openai": OpenAIBatchEndpoint,
+    "local": LocalBatchEndpoint,
+}
+
+
+def get_batch_endpoint(name: str) -> BatchEndpoint:
+    if name not in BATCH_ENDPOINTS:
+        raise ValueError(f"Unknown batch endpoint '{name}'. Available: {list(BATCH_ENDPOINTS.keys())}")
+    return BATCH_ENDPOINTS[name]()
+
+
+def run_batch(endpoint: BatchEndpoint,
+              bodies: list[dict],
+              poll_interval: float = 30,
+              batch_dir: Path = None) -> list[dict | None]:
+    """Submits the chat completion request bodies as one batch job, waits for its
+    completion, and returns the response bodies in the order of the requests. Failed
+    requests have None as response."""
+    batch_dir = Path(batch_dir) if batch_dir else DEFAULT_BATCH_DIR
+    batch_dir.mkdir(parents=True, exist_ok=True)
+
+    # Write the requests file
+    job_name = f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    requests_path = batch_dir / f"{job_name}_requests.jsonl"
+    with open(requests_path, "w") as f:
+        for i, body in enumerate(bodies):
+            request = dict(custom_id=f"request-{i}", method="POST", url="/v1/chat/completions", body=body)
+            f.write(json.dumps(request) + "\n")
+
+    batch_id = endpoint.submit(requests_path)
+    logger.info(f"Submitted batch job {batch_id} with {len(bodies)} requests.")
+
+    while (status := endpoint.get_status(batch_id)) not in TERMINAL_STATES:
+        time.sleep(poll_interval)
+
+    if status != "completed":
+        logger.error(f"Batch job {batch_id} ended with status '{status}'.")
+        return [None] * len(bodies)
+
+    # Ingest the results
+    results_path = batch_dir / f"{job_name}_results.jsonl"
+    endpoint.download_results(batch_id, results_path)
+    responses: list[dict | None] = [None] * len(bodies)
+    with open(results_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            i = int(result["custom_id"].split("-")[-1])
+            response = result.get("response")
+            if result.get("error") is None and response is not None and response.get("status_code") == 200:
+                responses[i] = response["body"]
+            else:
+                logger.warning(f"Request {i} of batch job {batch_id} failed: {result.get('error')}")
+    logger.info(f"Batch job {batch_id} completed.")
+    return responses
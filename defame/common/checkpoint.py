@@ -0,0 +1,56 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+from defame.common.claim import Claim
+from defame.common.logger import logger
+from defame.common.report import Report
+
+
+class Checkpoint:
+    """On-disk snapshot of an unfinished fact-check, consisting of the Report and the
+    state after the last completed stage. Enables resuming an interrupted fact-check
+    from that stage instead of starting over."""
+
+    def __init__(self, path: str | Path, claim: Claim):
+        self.path = Path(path)
+        self.claim_str = str(claim)
+        self.state: dict = dict()
+
+    def load(self) -> Optional[Report]:
+        """Returns the Report of the checkpoint (if existing and belonging to the claim)
+        and restores the state."""
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load the checkpoint {self.path.as_posix()}: {e!r}")
+            return None
+        if data["claim"] != self.claim_str:
+            return None
+        self.state = data["state"]
+        return data["doc"]
+
+    def save(self, doc: Report, **state):
+        """Replaces the checkpoint with the given Report and state. The state must
+        fully describe the progress, e.g., save(doc, questions=...) and later
+        save(doc, questions=..., q_and_a=...)."""
+        self.state = state
+        try:
+            data = pickle.dumps(dict(claim=self.claim_str, doc=doc, state=state))
+        except Exception as e:
+            logger.warning(f"Could not save the checkpoint: {e!r}")
+            return
+        # Write to a temporary file first so that no incomplete checkpoint remains on a crash
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+        self.state = dict()
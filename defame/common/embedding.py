@@ -1,7 +1,6 @@
 from typing import Sequence
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 
 class EmbeddingModel:
@@ -9,6 +8,8 @@ class EmbeddingModel:
     dimension: int
 
     def __init__(self, model_name: str, truncate_after: int = 32_000, device=None):
+        from sentence_transformers import SentenceTransformer
+
         self.model = SentenceTransformer(model_name,
                                          trust_remote_code=True,
                                          config_kwargs=dict(resume_download=None),
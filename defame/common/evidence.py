@@ -5,10 +5,11 @@ from ezmm import MultimodalSequence
 
 from defame.common.results import Results
 from defame.common.action import Action
+from defame.utils.rendering import CachedStr
 
 
 @dataclass
-class Evidence:
+class Evidence(CachedStr):
     """Any chunk of possibly helpful information found during the
     fact-check. Is typically the output of performing an Action."""
     raw: Results  # The raw output from the executed tool
@@ -20,7 +21,7 @@ class Evidence:
         i.e., if there are any takeaways."""
         return self.takeaways is not None
 
-    def __str__(self):
+    def _render(self) -> str:
         header = f"### Evidence from `{self.action.name}`\n"
         body = str(self.takeaways if self.takeaways else self.raw)
         return header + body
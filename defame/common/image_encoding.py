@@ -0,0 +1,112 @@
+"""Encoding of images for LLM APIs. Encodings are cached per image, so an image that
+appears in several prompts of a fact-check gets read and encoded only once."""
+
+import base64
+import math
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL.Image import Resampling
+from ezmm import Image
+
+# See https://platform.openai.com/docs/guides/vision: Images are first scaled to fit into
+# a 2048 x 2048 square, then such that the shortest side is at most 768 px long. The
+# result is covered with tiles of 512 x 512 px, each tile costing the same number of tokens.
+TILE_SIZE = 512
+MAX_SIDE_LEN = 2048
+MAX_SHORT_SIDE_LEN = 768
+
+
+def get_billed_size(width: int, height: int) -> tuple[int, int]:
+    """Returns the size to which the OpenAI API scales an image before tiling it."""
+    scale = min(1, MAX_SIDE_LEN / max(width, height))
+    short_side_len = min(width, height) * scale
+    if short_side_len > MAX_SHORT_SIDE_LEN:
+        scale *= MAX_SHORT_SIDE_LEN / short_side_len
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def count_tiles(width: int, height: int) -> int:
+    width, height = get_billed_size(width, height)
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def fit_to_tile_grid(width: int, height: int, min_scale: float = 0.8) -> tuple[int, int]:
+    """Returns the size to which an image should be downscaled such that it covers
+    as few tiles as possible, i.e., images slightly overlapping a tile boundary get
+    shrunk to that boundary. Never shrinks the (billed) size by more than `min_scale`
+    and keeps the aspect ratio."""
+    width, height = get_billed_size(width, height)
+    best_size, best_n_tiles = (width, height), count_tiles(width, height)
+
+    # Candidate scales are those aligning one of the sides with a tile boundary
+    for side_len in (width, height):
+        n_tiles_along_side = math.ceil(side_len / TILE_SIZE)
+        for n in range(n_tiles_along_side - 1, 0, -1):
+            scale = n * TILE_SIZE / side_len
+            if scale < min_scale:
+                break
+            size = (max(1, math.floor(width * scale)), max(1, math.floor(height * scale)))
+            n_tiles = count_tiles(*size)
+            if n_tiles < best_n_tiles or n_tiles == best_n_tiles and size[0] > best_size[0]:
+                best_size, best_n_tiles = size, n_tiles
+    return best_size
+
+
+class EncodedImageCache:
+    """Thread-safe LRU cache of base64-encoded images, bounded by the total length of
+    the encodings."""
+
+    def __init__(self, max_size: int = 256 * 1024 ** 2):
+        """
+        @param max_size: Max. total number of characters of all cached encodings.
+        """
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+            return encoded
+
+    def put(self, key: tuple, encoded: str):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = encoded
+            self._size += len(encoded)
+            while self._size > self.max_size and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+encoded_images = EncodedImageCache()
+
+
+def encode_image(image: Image, downscale: bool = False) -> str:
+    """Returns the image as base64-encoded JPEG. If `downscale` is set, shrinks the
+    image to the size the OpenAI API bills for, aligned to the tile grid, see
+    fit_to_tile_grid()."""
+    key = (str(image.file_path), downscale)
+    encoded = encoded_images.get(key)
+    if encoded is None:
+        pillow_image = image.image
+        if downscale:
+            size = fit_to_tile_grid(pillow_image.width, pillow_image.height)
+            if size != pillow_image.size:
+                pillow_image = pillow_image.resize(size, Resampling.LANCZOS)
+        buffered = BytesIO()
+        pillow_image.save(buffered, format="JPEG")
+        encoded = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        encoded_images.put(key, encoded)
+    return encoded
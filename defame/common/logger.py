@@ -3,13 +3,13 @@ import json
 import logging
 import os.path
 import sys
+import threading
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from multiprocessing.connection import Connection
 from pathlib import Path
 from typing import Optional
 
-import pandas as pd
 import yaml
 
 from config.globals import result_base_dir
@@ -65,6 +65,7 @@ class Logger:
         self._current_fact_check_id: Optional[str] = None
         self.print_log_level = "debug"
         self.connection: Optional[Connection] = None
+        self._send_lock = threading.Lock()  # claims may be verified concurrently
         self.separator = "_" * 25
         self.is_averitec_run = None
 
@@ -185,10 +186,11 @@ class Logger:
     def send(self, msg: str):
         """Sends the message through the connection."""
         if self.connection is not None and self._current_fact_check_id is not None:
-            self.connection.send(dict(
-                task_id=self._current_fact_check_id,
-                status_message=msg,
-            ))
+            with self._send_lock:
+                self.connection.send(dict(
+                    task_id=self._current_fact_check_id,
+                    status_message=msg,
+                ))
 
     def critical(self, *args, send: bool = True):
         msg = compose_message(*args)
@@ -279,6 +281,8 @@ class Logger:
                                     gt_justification))
 
     def save_next_instance_stats(self, stats: dict, claim_id: int):
+        import pandas as pd
+
         assert self.experiment_dir is not None
         all_instance_stats = self._load_stats_df()
 
@@ -293,6 +297,8 @@ class Logger:
         all_instance_stats.to_csv(self.instance_stats_path)
 
     def _load_stats_df(self):
+        import pandas as pd
+
         if os.path.exists(self.instance_stats_path):
             df = pd.read_csv(self.instance_stats_path)
             df.set_index("ID", inplace=True)
@@ -1,5 +1,6 @@
+import math
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from ezmm import MultimodalSequence
 
@@ -16,6 +17,7 @@ class Prompt(MultimodalSequence):
     template_file_path: Optional[str] = None
     name: Optional[str]
     retry_instruction: Optional[str] = None
+    doc_token_budget: Optional[int] = None  # max. number of tokens the contained Report may occupy
 
     def __init__(self,
                  text: str = None,
@@ -31,6 +33,40 @@ class Prompt(MultimodalSequence):
             text = compose_prompt(self.template_file_path, placeholder_targets)
         super().__init__(text)
         self.name = name
+        self.placeholder_targets = placeholder_targets
+
+    def fit_to_budget(self, max_tokens: int, count_tokens: Callable[["Prompt | str"], int]) -> bool:
+        """Re-renders the Report(s) contained in this prompt (if any) such that the
+        whole prompt fits into max_tokens and each Report into the prompt's
+        doc_token_budget. Returns True iff the prompt was changed."""
+        from defame.common.report import Report  # Lazy import to avoid circular dependencies
+
+        if self.template_file_path is None or not self.placeholder_targets:
+            return False
+        docs = {placeholder: target for placeholder, target in self.placeholder_targets.items()
+                if isinstance(target, Report)}
+        if not docs:
+            return False
+
+        n_excess_tokens = max(count_tokens(self) - max_tokens, 0)
+        n_doc_tokens = {placeholder: count_tokens(str(doc)) for placeholder, doc in docs.items()}
+        n_doc_tokens_total = sum(n_doc_tokens.values())
+
+        targets = dict(self.placeholder_targets)
+        changed = False
+        for placeholder, doc in docs.items():
+            # Each Report gives up its share of the excess tokens
+            share = n_doc_tokens[placeholder] / n_doc_tokens_total if n_doc_tokens_total else 0
+            budget = n_doc_tokens[placeholder] - math.ceil(n_excess_tokens * share)
+            if self.doc_token_budget is not None:
+                budget = min(budget, self.doc_token_budget)
+            if budget < n_doc_tokens[placeholder]:
+                targets[placeholder] = doc.render(max_tokens=budget, count_tokens=count_tokens)
+                changed = True
+
+        if changed:
+            super().__init__(compose_prompt(self.template_file_path, targets))
+        return changed
 
     def extract(self, response: str) -> dict | str | None:
         """Takes the model's output string and extracts the expected data."""
@@ -0,0 +1,98 @@
+"""Statistics about the LLM calls, broken down by prompt type. All values are counts or
+sums so that they can be summed up across claims (see aggregate_stats())."""
+
+import math
+import threading
+from typing import Sequence
+
+
+class Histogram:
+    """Counts values falling into the buckets delimited by `edges`. The bucket with
+    upper edge `e` holds the values v with previous edge < v <= e."""
+
+    def __init__(self, edges: Sequence[float], unit: str = ""):
+        self.edges = list(edges) + [math.inf]
+        self.unit = unit
+        self.counts = [0] * len(self.edges)
+
+    def add(self, value: float):
+        for i, edge in enumerate(self.edges):
+            if value <= edge:
+                self.counts[i] += 1
+                return
+
+    def _bucket_name(self, i: int) -> str:
+        if self.edges[i] == math.inf:
+            return f">{self.edges[i - 1]:g}{self.unit}" if i > 0 else "all"
+        return f"<={self.edges[i]:g}{self.unit}"
+
+    def to_dict(self) -> dict[str, int]:
+        return {self._bucket_name(i): count for i, count in enumerate(self.counts)}
+
+
+class PromptTypeStats:
+    """Collects the statistics of all generate() calls of one prompt type."""
+
+    def __init__(self):
+        self.n_calls = 0
+        self.n_failed_calls = 0  # calls without any usable response
+        self.n_attempts = 0
+        self.n_extraction_failures = 0
+        self.n_input_tokens = 0
+        self.n_output_tokens = 0
+        self.total_latency = 0.0
+        self.latency = Histogram([0.5, 1, 2, 5, 10, 30, 60], unit="s")
+        self.input_tokens = Histogram([256, 1024, 4096, 16384, 65536])
+        self.output_tokens = Histogram([16, 64, 256, 1024, 4096])
+        self.attempts = Histogram([1, 2, 3, 5])
+
+    def add(self, latency: float, n_input_tokens: int, n_output_tokens: int,
+            n_attempts: int, n_extraction_failures: int, failed: bool):
+        self.n_calls += 1
+        self.n_failed_calls += failed
+        self.n_attempts += n_attempts
+        self.n_extraction_failures += n_extraction_failures
+        self.n_input_tokens += n_input_tokens
+        self.n_output_tokens += n_output_tokens
+        self.total_latency += latency
+        self.latency.add(latency)
+        self.input_tokens.add(n_input_tokens)
+        self.output_tokens.add(n_output_tokens)
+        self.attempts.add(n_attempts)
+
+    def to_dict(self) -> dict:
+        return {
+            "Calls": self.n_calls,
+            "Failed calls": self.n_failed_calls,
+            "Attempts": self.n_attempts,
+            "Extraction failures": self.n_extraction_failures,
+            "Input tokens": self.n_input_tokens,
+            "Output tokens": self.n_output_tokens,
+            "Total latency": self.total_latency,
+            "Latency histogram": self.latency.to_dict(),
+            "Input tokens histogram": self.input_tokens.to_dict(),
+            "Output tokens histogram": self.output_tokens.to_dict(),
+            "Attempts histogram": self.attempts.to_dict(),
+        }
+
+
+class PromptStats:
+    """Thread-safe collection of PromptTypeStats, one per prompt type."""
+
+    def __init__(self):
+        self._stats: dict[str, PromptTypeStats] = dict()
+        self._lock = threading.Lock()
+
+    def add(self, prompt_type: str, **kwargs):
+        with self._lock:
+            if prompt_type not in self._stats:
+                self._stats[prompt_type] = PromptTypeStats()
+            self._stats[prompt_type].add(**kwargs)
+
+    def reset(self):
+        with self._lock:
+            self._stats = dict()
+
+    def to_dict(self) -> dict[str, dict]:
+        with self._lock:
+            return {prompt_type: stats.to_dict() for prompt_type, stats in self._stats.items()}
@@ -0,0 +1,199 @@
+"""Host-wide rate limiting for LLM APIs. The limiter state lives in a SQLite file so
+that all worker processes on a machine draw from the same budgets."""
+
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from config.globals import temp_dir
+
+DEFAULT_RATE_LIMITS_PATH = temp_dir / "rate_limits.db"
+
+
+class RateLimiter:
+    """Enforces requests-per-minute (RPM) and tokens-per-minute (TPM) budgets for one
+    model via two token buckets, shared by all processes using the same `db_path`.
+    Callers are served in first-come-first-served order. When the API nevertheless
+    signals a rate limit hit (HTTP 429), all callers back off together."""
+
+    stale_after = 30  # seconds after which a waiting caller that stopped polling is dropped
+
+    def __init__(self,
+                 model_name: str,
+                 rpm_limit: int = None,
+                 tpm_limit: int = None,
+                 db_path: str | Path = None,
+                 max_backoff: float = 60):
+        """
+        @param model_name: The budgets are tracked per model name.
+        @param rpm_limit: Max. number of requests per minute. No limit if None.
+        @param tpm_limit: Max. number of (input and output) tokens per minute. No limit if None.
+        @param db_path: The SQLite file holding the shared limiter state. Use the same
+            file across processes to share the budgets.
+        @param max_backoff: The max. number of seconds to back off after a rate limit hit.
+        """
+        self.model_name = model_name
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.db_path = Path(db_path) if db_path else DEFAULT_RATE_LIMITS_PATH
+        self.max_backoff = max_backoff
+        self._local = threading.local()  # SQLite connections must not be shared across threads
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets ("
+                           "model TEXT PRIMARY KEY, "
+                           "requests REAL NOT NULL, "
+                           "tokens REAL NOT NULL, "
+                           "updated_at REAL NOT NULL, "
+                           "blocked_until REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS waiters ("
+                           "ticket INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "model TEXT NOT NULL, "
+                           "heartbeat REAL NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, 0)",
+                           (model_name, rpm_limit or 0, tpm_limit or 0, time.time()))
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def has_budgets(self) -> bool:
+        return self.rpm_limit is not None or self.tpm_limit is not None
+
+    async def acquire(self, n_tokens: int = 0):
+        """Waits until one request consuming `n_tokens` fits into the budgets and
+        consumes them. Callers are admitted in the order of their arrival."""
+        if not self.has_budgets:
+            while (wait := await asyncio.to_thread(self._get_blocked_time)) > 0:
+                await asyncio.sleep(wait)
+            return
+
+        ticket = await asyncio.to_thread(self._enqueue)
+        try:
+            while (wait := await asyncio.to_thread(self._try_acquire, ticket, n_tokens)) > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            await asyncio.to_thread(self._dequeue, ticket)
+            raise
+
+    def consume(self, n_tokens: int):
+        """Charges tokens that were not accounted for on acquire(), like the output
+        tokens. Makes subsequent callers wait if the budget is exceeded."""
+        if self.tpm_limit is None or n_tokens == 0:
+            return
+        with self._transaction() as conn:
+            conn.execute("UPDATE buckets SET tokens = tokens - ? WHERE model = ?", (n_tokens, self.model_name))
+
+    async def backoff(self, attempt: int, retry_after: float = None):
+        """Waits after a rate limit hit with exponential backoff and full jitter. Blocks
+        all other callers of this model, too.
+        @param attempt: The number of preceding consecutive rate limit hits.
+        @param retry_after: The waiting time (in seconds) suggested by the API, if any."""
+        delay = random.uniform(0, min(self.max_backoff, 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        await asyncio.to_thread(self._block, delay)
+        await asyncio.sleep(delay)
+
+    def _enqueue(self) -> int:
+        cursor = self._conn.execute("INSERT INTO waiters (model, heartbeat) VALUES (?, ?)",
+                                    (self.model_name, time.time()))
+        return cursor.lastrowid
+
+    def _dequeue(self, ticket: int):
+        self._conn.execute("DELETE FROM waiters WHERE ticket = ?", (ticket,))
+
+    def _try_acquire(self, ticket: int, n_tokens: int) -> float:
+        """Consumes the budgets if the ticket is the next in line and the budgets suffice.
+        Returns 0 on success, else the number of seconds to wait before trying again."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE waiters SET heartbeat = ? WHERE ticket = ?", (now, ticket))
+            conn.execute("DELETE FROM waiters WHERE model = ? AND heartbeat < ?",
+                         (self.model_name, now - self.stale_after))
+            n_ahead = conn.execute("SELECT COUNT(*) FROM waiters WHERE model = ? AND ticket < ?",
+                                   (self.model_name, ticket)).fetchone()[0]
+            if n_ahead > 0:
+                return min(0.05 * n_ahead, 1.0)
+
+            requests, tokens, blocked_until = self._refill(conn, now)
+            if blocked_until > now:
+                return blocked_until - now
+
+            wait = 0
+            if self.rpm_limit is not None and requests < 1:
+                wait = max(wait, (1 - requests) * 60 / self.rpm_limit)
+            if self.tpm_limit is not None:
+                n_required = min(n_tokens, self.tpm_limit)  # oversized requests need a full bucket
+                if tokens < n_required:
+                    wait = max(wait, (n_required - tokens) * 60 / self.tpm_limit)
+            if wait > 0:
+                return min(wait, 1.0)  # re-check regularly to keep the heartbeat alive
+
+            conn.execute("UPDATE buckets SET requests = requests - ?, tokens = tokens - ? WHERE model = ?",
+                         (1 if self.rpm_limit is not None else 0,
+                          n_tokens if self.tpm_limit is not None else 0, self.model_name))
+            conn.execute("DELETE FROM waiters WHERE ticket = ?", (ticket,))
+            return 0
+
+    def _refill(self, conn: sqlite3.Connection, now: float) -> tuple[float, float, float]:
+        requests, tokens, updated_at, blocked_until = conn.execute(
+            "SELECT requests, tokens, updated_at, blocked_until FROM buckets WHERE model = ?",
+            (self.model_name,)).fetchone()
+        elapsed = max(now - updated_at, 0)
+        if self.rpm_limit is not None:
+            # Never negative, but may be in DBs of older versions which always charged the requests
+            requests = min(max(requests, 0) + elapsed * self.rpm_limit / 60, self.rpm_limit)
+        if self.tpm_limit is not None:
+            tokens = min(tokens + elapsed * self.tpm_limit / 60, self.tpm_limit)
+        conn.execute("UPDATE buckets SET requests = ?, tokens = ?, updated_at = ? WHERE model = ?",
+                     (requests, tokens, now, self.model_name))
+        return requests, tokens, blocked_until
+
+    def _get_blocked_time(self) -> float:
+        blocked_until = self._conn.execute("SELECT blocked_until FROM buckets WHERE model = ?",
+                                           (self.model_name,)).fetchone()[0]
+        return max(blocked_until - time.time(), 0)
+
+    def _block(self, duration: float):
+        with self._transaction() as conn:
+            conn.execute("UPDATE buckets SET blocked_until = MAX(blocked_until, ?) WHERE model = ?",
+                         (time.time() + duration, self.model_name))
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._conn)
+
+
+class _Transaction:
+    """Serializes writers across processes."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Returns the waiting time suggested by the API's Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or dict()
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -1,14 +1,18 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Collection
+from typing import Callable, Collection
 from pathlib import Path
+import os
 import shutil
 
 import numpy as np
 from ezmm import MultimodalSequence
-from markdown_pdf import MarkdownPdf, Section
 
-from defame.common import Action, Claim, Label, Evidence
+from defame.common import Action, Claim, Label, Evidence, logger
 from defame.utils.parsing import replace_item_refs
+from defame.utils.rendering import CachedStr
+
+REPORT_FORMATS = ("md", "media", "pdf")  # the Markdown file, the referenced media files, and the rendered PDF
 
 
 @dataclass
@@ -29,10 +33,10 @@ class ActionsBlock:
 
 
 @dataclass
-class EvidenceBlock:
+class EvidenceBlock(CachedStr):
     evidences: Collection[Evidence]
 
-    def __str__(self):
+    def _render(self) -> str:
         any_is_useful = np.any([e.is_useful() for e in self.evidences])
         if not any_is_useful:
             summary = "No new evidence found."
@@ -48,6 +52,20 @@ class EvidenceBlock:
                 n_useful += 1
         return n_useful
 
+    def condensed(self, max_len: int = 500) -> str:
+        """Returns a shortened version of this block where each evidence
+        is truncated to (roughly) max_len characters."""
+        if self.num_useful_evidences == 0:
+            return str(self)
+        evidence_strs = []
+        for e in self.evidences:
+            if e.is_useful():
+                e_str = str(e)
+                if len(e_str) > max_len:
+                    e_str = e_str[:max_len].rsplit(" ", 1)[0] + " [...]"
+                evidence_strs.append(e_str)
+        return "## Evidence\n" + "\n\n".join(evidence_strs)
+
     def get_useful_evidences_str(self) -> str:
         if self.num_useful_evidences > 0:
             useful_evidences = [str(e) for e in self.evidences if e.is_useful()]
@@ -56,9 +74,11 @@ class EvidenceBlock:
             return "No new useful evidence!"
 
 
-class Report:
+class Report(CachedStr):
     """An (incrementally growing) document, recording the fact-check. It contains
-    information like the claim, retrieved evidence, and all intermediate reasoning."""
+    information like the claim, retrieved evidence, and all intermediate reasoning.
+    The rendered string is cached (as are those of the evidence blocks) and invalidated
+    whenever a block gets added or the verdict or justification is set."""
 
     claim: Claim
     record: list  # contains intermediate reasoning and evidence, organized in blocks
@@ -71,9 +91,16 @@ class Report:
         # if claim.original_context.interpretation:
         #     self.add_reasoning("## Interpretation\n" + claim.original_context.interpretation)
 
-    def save_to(self, directory: str | Path):
+    def save_to(self, directory: str | Path, formats: Collection[str] = REPORT_FORMATS):
         """Saves the Report to the specified directory. Exports the raw
-        Markdown report, all referenced media files, and a rendered PDF."""
+        Markdown report ("md"), all referenced media files ("media"), and a
+        rendered PDF ("pdf"), as far as selected by `formats`. Omitted PDFs can
+        be rendered later from the Markdown report, see render_pdf()."""
+        unknown_formats = set(formats) - set(REPORT_FORMATS)
+        if unknown_formats:
+            raise ValueError(f"Unknown report format(s): {unknown_formats}. "
+                             f"Please use any of {REPORT_FORMATS}.")
+
         directory = Path(directory)
         directory.mkdir(exist_ok=True, parents=True)
 
@@ -83,41 +110,92 @@ class Report:
         report_str = replace_item_refs(report_str, media)
 
         # Save the Markdown file
-        with open(directory / "report.md", "w") as f:
-            f.write(report_str)
+        if "md" in formats:
+            with open(directory / "report.md", "w") as f:
+                f.write(report_str)
 
         # Save all associated media files in a separate subdirectory
-        media_dir = directory / "media"
-        media_dir.mkdir(exist_ok=True)
-        for medium in media:
-            medium_copy_path = media_dir / medium.file_path.name
-            shutil.copy(medium.file_path, medium_copy_path)
+        if "media" in formats:
+            media_dir = directory / "media"
+            media_dir.mkdir(exist_ok=True)
+            for medium in media:
+                medium_copy_path = media_dir / medium.file_path.name
+                shutil.copy(medium.file_path, medium_copy_path)
 
-        # Save a rendered PDF
-        pdf = MarkdownPdf(toc_level=0)
-        pdf.add_section(Section(report_str, toc=False, root=directory.as_posix()))
+        if "pdf" in formats:
+            render_pdf(directory, report_str)
 
-        pdf.meta["title"] = "Fact-Check Report"
-        pdf.save(directory / "report.pdf")
+    def _render(self) -> str:
+        return self._compose([str(block) for block in self.record])
 
-    def __str__(self):
+    def render(self, max_tokens: int = None, count_tokens: Callable[[str], int] = None) -> str:
+        """Returns the Report as a string. If max_tokens is given, the record gets
+        condensed until the Report fits into that budget (as measured by count_tokens).
+        Old evidence is shortened and dropped first, then old actions and reasoning.
+        The claim and the latest block of each kind are always kept."""
+        if max_tokens is None or not self.record:
+            return str(self)
+        if count_tokens is None:
+            raise ValueError("Rendering a Report within a token budget requires count_tokens.")
+        block_strs = [str(block) for block in self.record]
+        block_strs = self._fit_record(block_strs, max_tokens, count_tokens)
+        return self._compose(block_strs)
+
+    def _compose(self, block_strs: list[str]) -> str:
         doc_str = f'## Claim\n{self.claim}'
-        if self.record:
-            doc_str += "\n\n" + "\n\n".join([str(block) for block in self.record])
+        if block_strs:
+            doc_str += "\n\n" + "\n\n".join(block_strs)
         if self.verdict:
             doc_str += f"\n\n### Verdict: {self.verdict.name}"
         if self.justification:
             doc_str += f"\n\n### Justification\n{self.justification}"
         return doc_str
 
+    def _fit_record(self,
+                    block_strs: list[str],
+                    max_tokens: int,
+                    count_tokens: Callable[[str], int]) -> list[str]:
+        """Condenses the rendered record blocks until they fit into the token budget.
+        Returns the remaining block strings."""
+        block_strs = list(block_strs)
+        n_tokens = [count_tokens(s) for s in block_strs]
+        omission_note = "[Older parts of the record were omitted to save space.]"
+        n_tokens_rest = count_tokens(self._compose([omission_note]))  # claim, verdict, etc.
+
+        def older_blocks_of(block_type) -> list[int]:
+            """Indices of all blocks of the given type except the latest one, oldest first."""
+            indices = [i for i, block in enumerate(self.record) if isinstance(block, block_type)]
+            return indices[:-1]
+
+        # Ordered from least to most valuable
+        reductions = [(i, "condense") for i in older_blocks_of(EvidenceBlock)]
+        reductions += [(i, "omit") for i in older_blocks_of(EvidenceBlock)]
+        reductions += [(i, "omit") for i in older_blocks_of(ActionsBlock)]
+        reductions += [(i, "omit") for i in older_blocks_of(ReasoningBlock)]
+
+        for i, reduction in reductions:
+            if n_tokens_rest + sum(n_tokens) <= max_tokens:
+                break
+            block_strs[i] = self.record[i].condensed() if reduction == "condense" else None
+            n_tokens[i] = count_tokens(block_strs[i]) if block_strs[i] else 0
+
+        if None in block_strs:
+            first_omitted = block_strs.index(None)
+            block_strs[first_omitted] = omission_note
+        return [s for s in block_strs if s is not None]
+
     def add_reasoning(self, text: str):
-        self.record.append(ReasoningBlock(text))
+        self._add_block(ReasoningBlock(text))
 
     def add_actions(self, actions: list[Action]):
-        self.record.append(ActionsBlock(actions))
+        self._add_block(ActionsBlock(actions))
 
     def add_evidence(self, evidences: Collection[Evidence]):
-        self.record.append(EvidenceBlock(evidences))
+        self._add_block(EvidenceBlock(evidences))
+
+    def _add_block(self, block):
+        self.record.append(block)
+        self.invalidate()
 
     def get_all_reasoning(self) -> list[str]:
         reasoning_texts = []
@@ -136,3 +214,70 @@ class Report:
     def get_result_as_dict(self) -> dict:
         """Returns the final verdict and the justification as a dictionary."""
         return {"verdict": self.verdict.name, "justification": self.justification}
+
+
+def render_pdf(directory: str | Path, report_str: str = None) -> Path:
+    """Renders the Markdown report (read from the directory's report.md file
+    if `report_str` is not given) and saves it as report.pdf into the
+    directory. Returns the path to the PDF."""
+    from markdown_pdf import MarkdownPdf, Section
+
+    directory = Path(directory)
+    if report_str is None:
+        with open(directory / "report.md") as f:
+            report_str = f.read()
+
+    pdf = MarkdownPdf(toc_level=0)
+    pdf.add_section(Section(report_str, toc=False, root=directory.as_posix()))
+    pdf.meta["title"] = "Fact-Check Report"
+
+    # Write to a temporary file first so that no incomplete PDF can be read
+    pdf_path = directory / "report.pdf"
+    tmp_path = directory / f".report.{os.getpid()}.{id(pdf)}.tmp.pdf"
+    pdf.save(tmp_path)
+    os.replace(tmp_path, pdf_path)
+    return pdf_path
+
+
+class ReportExporter:
+    """Saves Reports in the given formats. The Markdown and media files are written
+    right away while the PDFs, which are slow to render, are rendered by a background
+    thread, so that the caller can proceed with the next fact-check."""
+
+    def __init__(self, formats: Collection[str] = REPORT_FORMATS, background: bool = True):
+        """
+        @param formats: The formats to export, see Report.save_to().
+        @param background: If False, renders the PDFs synchronously.
+        """
+        self.formats = tuple(formats)
+        self.background = background
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: list[Future] = []
+
+    def export(self, doc: Report, directory: str | Path):
+        if not self.background or "pdf" not in self.formats:
+            doc.save_to(directory, formats=self.formats)
+            return
+
+        doc.save_to(directory, formats=[f for f in self.formats if f != "pdf"])
+        if "md" in self.formats:
+            job = (render_pdf, directory)
+        else:
+            job = (doc.save_to, directory, ["pdf"])
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report_export")
+        self._pending = [future for future in self._pending if not future.done()]
+        future = self._executor.submit(*job)
+        future.add_done_callback(_log_export_error)
+        self._pending.append(future)
+
+    def wait(self):
+        """Blocks until all pending exports are finished."""
+        for future in self._pending:
+            future.exception()
+        self._pending = []
+
+
+def _log_export_error(future: Future):
+    if future.exception() is not None:
+        logger.error(f"Failed to export the report PDF: {future.exception()!r}")
@@ -0,0 +1,111 @@
+"""Persistent, content-addressed cache for LLM responses. Backed by SQLite so that
+all worker processes on a machine can share one store concurrently."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from ezmm import Item
+
+from config.globals import temp_dir
+from defame.common.prompt import Prompt
+
+DEFAULT_CACHE_PATH = temp_dir / "llm_response_cache.db"
+
+
+class ResponseCache:
+    """Maps LLM requests to previously obtained responses. A request is identified by
+    the hash over everything that determines the model's output: the model, the system
+    prompt, the prompt's text and media contents, and the sampling parameters. The store
+    is bounded in size, evicting the least-recently used entries first."""
+
+    def __init__(self, db_path: str | Path = None, max_size: int = 1024 ** 3):
+        """
+        @param db_path: The SQLite file to store the responses in. Use the same file
+            across processes to share the cache.
+        @param max_size: The maximum total size (in bytes) of all cached responses.
+        """
+        self.db_path = Path(db_path) if db_path else DEFAULT_CACHE_PATH
+        self.max_size = max_size
+        self._local = threading.local()  # SQLite connections must not be shared across threads
+        self._item_digests: dict[str, str] = dict()  # item reference: content hash
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                           "key TEXT PRIMARY KEY, "
+                           "response TEXT NOT NULL, "
+                           "size INTEGER NOT NULL, "
+                           "last_access REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, transactions are opened explicitly where needed
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer and vice versa
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def make_key(self,
+                 model_name: str,
+                 system_prompt: Optional[str],
+                 prompt: Prompt,
+                 temperature: float,
+                 top_p: float,
+                 top_k: int,
+                 max_response_len: int) -> str:
+        """Returns the content-addressed key for the given request. Media items are
+        represented by the hash of their file contents (and not by their reference)
+        so that keys remain stable across runs."""
+        key = hashlib.sha256()
+        header = [model_name, system_prompt, temperature, top_p, top_k, max_response_len]
+        key.update(json.dumps(header).encode())
+        for block in prompt.to_list():
+            if isinstance(block, Item):
+                key.update(f"\0{block.kind}\0{self._get_item_digest(block)}".encode())
+            else:
+                key.update(f"\0text\0{block}".encode())
+        return key.hexdigest()
+
+    def _get_item_digest(self, item: Item) -> str:
+        if item.reference not in self._item_digests:
+            file_bytes = Path(item.file_path).read_bytes()
+            self._item_digests[item.reference] = hashlib.sha256(file_bytes).hexdigest()
+        return self._item_digests[item.reference]
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for the key (if any) and marks it as recently used."""
+        row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, response: str):
+        """Stores the response and evicts the least-recently used entries if the
+        cache exceeds its size limit."""
+        size = len(response.encode())
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")  # serializes writers across processes
+        try:
+            conn.execute("INSERT OR REPLACE INTO responses (key, response, size, last_access) "
+                         "VALUES (?, ?, ?, ?)", (key, response, size, time.time()))
+            conn.execute("DELETE FROM responses WHERE key IN ("
+                         "SELECT key FROM ("
+                         "SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS cumulative_size "
+                         "FROM responses) "
+                         "WHERE cumulative_size > ?)", (self.max_size,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -9,3 +9,13 @@ class Results(ABC):
     def __str__(self):
         """LLM-friendly string representation of the result in Markdown format."""
         raise NotImplementedError
+
+
+class ErrorResults(Results):
+    """Stands in for the results of an action that failed to execute."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def __str__(self):
+        return f"The action could not be performed: {self.message}"
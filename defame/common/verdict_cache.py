@@ -0,0 +1,200 @@
+"""Persistent cache of claim-level fact-check results. Backed by SQLite so that all
+worker processes on a machine can share one store concurrently."""
+
+import hashlib
+import json
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+import numpy as np
+from ezmm import Item
+
+from config.globals import temp_dir, embedding_model as default_embedding_model
+from defame.common.logger import logger
+
+if TYPE_CHECKING:
+    from defame.common import Claim, Report
+    from defame.common.embedding import EmbeddingModel
+
+DEFAULT_CACHE_PATH = temp_dir / "verdict_cache.db"
+
+
+def normalize_claim_text(text: str) -> str:
+    """Removes differences in the claim text which don't affect its meaning, like
+    case, whitespace, quotation marks, and trailing punctuation."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"[\"'“”‘’«»]", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .!?")
+
+
+class VerdictCache:
+    """Maps claims to the Report and meta information of a previous fact-check. A claim
+    is identified by its normalized text, the content hashes of its media, its date, and
+    the configuration of the fact-checker. Optionally, claims whose text embedding is
+    sufficiently similar to that of a cached claim (with identical media, date, and
+    configuration) are considered near-duplicates and re-use the cached result, too."""
+
+    def __init__(self,
+                 db_path: str | Path = None,
+                 max_entries: int = 100_000,
+                 max_age: float = None,
+                 embedding_model: "str | EmbeddingModel" = None,
+                 similarity_threshold: float = None,
+                 device: str = None):
+        """
+        @param db_path: The SQLite file to store the results in. Use the same file
+            across processes to share the cache.
+        @param max_entries: The max. number of cached results. Least-recently used
+            entries get evicted first.
+        @param max_age: The time (in seconds) after which a cached result is no longer
+            used. Never expires if None.
+        @param embedding_model: The model (or its name) used to embed the claim texts for
+            the near-duplicate lookup. Defaults to the globally configured model.
+        @param similarity_threshold: The min. cosine similarity of two claim texts to be
+            considered near-duplicates. Disables the near-duplicate lookup if None.
+        @param device: The device to load the embedding model on.
+        """
+        self.db_path = Path(db_path) if db_path else DEFAULT_CACHE_PATH
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.similarity_threshold = similarity_threshold
+        self._embedding_model = embedding_model or default_embedding_model
+        self.device = device
+        self._embedding_lock = threading.Lock()
+        self._local = threading.local()  # SQLite connections must not be shared across threads
+        self._item_digests: dict[str, str] = dict()  # item reference: content hash
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                           "key TEXT PRIMARY KEY, "
+                           "lookup_key TEXT NOT NULL, "
+                           "embedding BLOB, "
+                           "result BLOB NOT NULL, "
+                           "created REAL NOT NULL, "
+                           "last_access REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lookup_key ON verdicts (lookup_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON verdicts (last_access)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, transactions are opened explicitly where needed
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer and vice versa
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def uses_embeddings(self) -> bool:
+        return self.similarity_threshold is not None
+
+    def _embed(self, text: str) -> np.ndarray:
+        """Returns the normalized embedding of the text. Loads the embedding model on first use."""
+        with self._embedding_lock:
+            if isinstance(self._embedding_model, str):
+                from defame.common.embedding import EmbeddingModel
+                self._embedding_model = EmbeddingModel(self._embedding_model, device=self.device)
+            embedding = np.asarray(self._embedding_model.embed(text), dtype=np.float32)
+        return embedding / max(np.linalg.norm(embedding), 1e-12)
+
+    def make_keys(self, claim: "Claim", config: str) -> tuple[str, str, str]:
+        """Returns the claim's exact key, its lookup key identifying the group of
+        potential near-duplicates (same media, date, and configuration), and its
+        normalized text."""
+        texts, media_digests = [], []
+        for block in claim.to_list():
+            if isinstance(block, Item):
+                texts.append(f"<{block.kind}>")
+                media_digests.append(self._get_item_digest(block))
+            else:
+                texts.append(str(block))
+        text = normalize_claim_text(" ".join(texts))
+        date = claim.date.isoformat() if claim.date else None
+
+        lookup_key = hashlib.sha256(json.dumps([config, date, media_digests]).encode()).hexdigest()
+        key = hashlib.sha256(f"{lookup_key}\0{text}".encode()).hexdigest()
+        return key, lookup_key, text
+
+    def _get_item_digest(self, item: Item) -> str:
+        if item.reference not in self._item_digests:
+            file_bytes = Path(item.file_path).read_bytes()
+            self._item_digests[item.reference] = hashlib.sha256(file_bytes).hexdigest()
+        return self._item_digests[item.reference]
+
+    def get(self, claim: "Claim", config: str) -> Optional[tuple["Report", dict, float]]:
+        """Returns the cached Report and meta information of the claim (or of a
+        near-duplicate) along with the similarity of the two claims (1 if identical)."""
+        key, lookup_key, text = self.make_keys(claim, config)
+        min_created = time.time() - self.max_age if self.max_age is not None else 0
+
+        row = self._conn.execute("SELECT key FROM verdicts WHERE key = ? AND created >= ?",
+                                 (key, min_created)).fetchone()
+        similarity = 1.0
+        if row is None and self.uses_embeddings:
+            candidates = self._conn.execute("SELECT key, embedding FROM verdicts "
+                                            "WHERE lookup_key = ? AND created >= ? AND embedding IS NOT NULL",
+                                            (lookup_key, min_created)).fetchall()
+            if candidates:
+                query = self._embed(text)
+                # Ignore embeddings of other embedding models
+                candidates = [(k, e) for k, e in candidates if len(e) == query.nbytes]
+            if candidates:
+                embeddings = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, embedding in candidates])
+                similarities = embeddings @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    row = candidates[best]
+                    similarity = float(similarities[best])
+
+        if row is None:
+            return None
+        return self._load(row[0], similarity)
+
+    def _load(self, key: str, similarity: float) -> Optional[tuple["Report", dict, float]]:
+        row = self._conn.execute("SELECT result FROM verdicts WHERE key = ?", (key,)).fetchone()
+        if row is None:  # evicted in the meantime
+            return None
+        try:
+            doc, meta = pickle.loads(row[0])
+        except Exception as e:
+            logger.warning(f"Could not load a cached verdict: {e!r}")
+            return None
+        self._conn.execute("UPDATE verdicts SET last_access = ? WHERE key = ?", (time.time(), key))
+        return doc, meta, similarity
+
+    def put(self, claim: "Claim", config: str, doc: "Report", meta: dict):
+        """Stores the fact-check result of the claim and evicts the least-recently used
+        entries if the cache exceeds its size limit."""
+        key, lookup_key, text = self.make_keys(claim, config)
+        try:
+            result = pickle.dumps((doc, meta))
+        except Exception as e:
+            logger.warning(f"Could not cache the verdict: {e!r}")
+            return
+        embedding = self._embed(text).tobytes() if self.uses_embeddings else None
+
+        now = time.time()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")  # serializes writers across processes
+        try:
+            conn.execute("INSERT OR REPLACE INTO verdicts (key, lookup_key, embedding, result, created, last_access) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, lookup_key, embedding, result, now, now))
+            conn.execute("DELETE FROM verdicts WHERE key IN ("
+                         "SELECT key FROM verdicts ORDER BY last_access DESC, key LIMIT -1 OFFSET ?)",
+                         (self.max_entries,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
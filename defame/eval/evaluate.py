@@ -22,7 +22,8 @@ from sklearn.metrics import precision_score, recall_score, f1_score
 from tqdm import tqdm
 
 from defame.common import Label, logger, Action
-from defame.common.modeling import model_specifier_to_shorthand, AVAILABLE_MODELS, make_model
+from defame.common.modeling import model_specifier_to_shorthand, get_available_models, make_model, \
+    model_shorthand_to_full_specifier
 from defame.eval import load_benchmark
 from defame.eval.averitec.benchmark import AVeriTeC
 from defame.eval.averitec.compute_score import compute_averitec_score
@@ -30,6 +31,7 @@ from defame.eval.benchmark import Benchmark
 from defame.eval.mocheg.benchmark import MOCHEG
 from defame.evidence_retrieval.tools import initialize_tools
 from defame.fact_checker import FactChecker
+from defame.helpers.parallelization.model_server import ModelServer
 from defame.helpers.parallelization.pool import Pool
 from defame.helpers.parallelization.task import Task
 from defame.utils.console import bold, sec2hhmmss, sec2mmss, num2text
@@ -52,7 +54,25 @@ def evaluate(
         print_log_level: str = "log",
         continue_experiment_dir: str = None,
         n_workers: int = None,
+        host_model: bool = False,
+        batch_endpoint: str = None,
+        save_checkpoints: bool = True,
 ):
+    """
+    @param host_model: If True, the (open-source) model is loaded only once into a
+        separate model server process which batches the requests of all workers.
+        Allows for many more workers than there are model copies fitting into memory.
+    @param batch_endpoint: If specified (e.g., "openai" or "local"), the independent LLM
+        calls (those a worker issues concurrently, like the source summaries) of all
+        workers are collected and submitted as batch jobs to this endpoint (see
+        BATCH_ENDPOINTS). The dependent calls use the real-time API. Supported only
+        for GPT models. Meant for large offline runs where only the cost and the
+        throughput matter: each batch job may take hours with the OpenAI Batch API.
+        Implies host_model.
+    @param save_checkpoints: If True, each claim's verification is checkpointed after
+        each stage so that resuming the evaluation (see `continue_experiment_dir`)
+        continues unfinished claims from their last completed stage.
+    """
     assert not n_samples or not sample_ids
 
     if llm_kwargs is None:
@@ -70,7 +90,13 @@ def evaluate(
     exp_name_str = f" '{bold(experiment_name)}'" if experiment_name else ""
     logger.info(f"{status_verb} evaluation{exp_name_str} on {benchmark.name}.")
 
-    llm = model_specifier_to_shorthand(llm) if llm not in AVAILABLE_MODELS["Shorthand"].values else llm
+    llm = model_specifier_to_shorthand(llm) if llm not in get_available_models()["Shorthand"].values else llm
+
+    if batch_endpoint is not None:
+        if model_shorthand_to_full_specifier(llm).split(":")[0].lower() != "openai":
+            raise ValueError(f"Batch endpoints are supported only for GPT models, not for '{llm}'.")
+        logger.warning(f"Submitting the independent LLM calls as batch jobs to '{batch_endpoint}'. "
+                       f"Each of these waits for a full batch job round trip, so expect a long runtime.")
 
     procedure_variant = fact_checker_kwargs.get("procedure_variant", FactChecker.default_procedure)
 
@@ -81,9 +107,15 @@ def evaluate(
                               experiment_name=experiment_name)
     logger.log("Saving all outputs to:", logger.target_dir.as_posix())
 
+    host_model = host_model or batch_endpoint is not None
+
     n_devices = torch.cuda.device_count()
     if n_workers is None:
         match llm:
+            case _ if batch_endpoint is not None:
+                n_workers = 32  # the more concurrent claims, the larger the batches
+            case _ if host_model:
+                n_workers = 16  # workers are lightweight, the model server batches their requests
             case "llama3_8b":
                 n_workers = 8
             case "llama3_70b":
@@ -156,9 +188,20 @@ def evaluate(
 
     print(f"Evaluating {n_samples} samples using {n_workers} workers...")
 
+    model_server = None
+    worker_llm_kwargs = llm_kwargs
+    if host_model:
+        if batch_endpoint is not None:
+            # Pool the independent requests of all workers for a while, then submit them as one batch job
+            model_server = ModelServer(llm, llm_kwargs=dict(**llm_kwargs, batch_endpoint=batch_endpoint),
+                                       max_batch_size=n_workers, max_batch_delay=5)
+        else:
+            model_server = ModelServer(llm, llm_kwargs=llm_kwargs)
+        worker_llm_kwargs = dict(**llm_kwargs, model_server=model_server.connection_info)
+
     pool = Pool(n_workers=n_workers,
                 llm=llm,
-                llm_kwargs=llm_kwargs,
+                llm_kwargs=worker_llm_kwargs,
                 tools_config=tools_config,
                 available_actions=allowed_actions,
                 class_definitions=benchmark.class_definitions,
@@ -167,6 +210,7 @@ def evaluate(
                 extra_judge_rules=benchmark.extra_judge_rules,
                 print_log_level=print_log_level,
                 target_dir=logger.target_dir,
+                save_checkpoints=save_checkpoints,
                 **fact_checker_kwargs)
 
     # Turn each sample into a task and add it to the pool's task queue
@@ -194,6 +238,9 @@ def evaluate(
         logger.critical(f"An unexpected error occurred in the main process:")
         logger.critical(traceback.format_exc())
 
+    # Let the workers complete their report exports before leaving
+    pool.stop()
+
     end_time = time.time()
     duration = end_time - start_time
 
@@ -202,6 +249,9 @@ def evaluate(
         "Total run duration": duration + stats.get("Total run duration", 0)
     })
 
+    if model_server is not None:
+        model_server.stop()
+
     finalize_evaluation(logger.target_dir, benchmark, stats)
 
 
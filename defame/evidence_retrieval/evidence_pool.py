@@ -0,0 +1,31 @@
+import threading
+from typing import Optional
+
+from ezmm import MultimodalSequence
+
+
+class EvidencePool:
+    """Shares evidence between the verifications of claims extracted from the same
+    Content: the scraped contents of web sources (by URL). The pool never adds sources
+    to a search's results, it only fills in the contents of sources which the search
+    itself returned. Hence, each claim's date restriction still applies. Source
+    summaries are not shared as they depend on the claim. Thread-safe."""
+
+    def __init__(self):
+        self._contents: dict[str, MultimodalSequence] = dict()
+        self._lock = threading.Lock()
+        self.n_reused_contents = 0
+
+    def get_content(self, url: str) -> Optional[MultimodalSequence]:
+        with self._lock:
+            content = self._contents.get(url)
+            if content is not None:
+                self.n_reused_contents += 1
+            return content
+
+    def add_content(self, url: str, content: Optional[MultimodalSequence]):
+        """Adds the scraped content of the web source. Failed scrapes (None) are not
+        added so that they may be retried."""
+        if content is not None:
+            with self._lock:
+                self._contents[url] = content
@@ -6,6 +6,7 @@ from typing import Optional
 from ezmm import MultimodalSequence, Image
 
 from defame.common import Results
+from defame.utils.rendering import CachedStr
 
 
 class SearchMode(Enum):
@@ -65,7 +66,7 @@ class Query:
 
 
 @dataclass
-class Source:
+class Source(CachedStr):
     """A source of information. For example, a web page or an excerpt
      of a local knowledge base. Each source must be clearly identifiable
      (and ideally also retrievable) by its reference."""
@@ -93,7 +94,7 @@ class Source:
         else:
             return "⚠️ Content not yet loaded."
 
-    def __str__(self):
+    def _render(self) -> str:
         """Uses the summary if available, otherwise the raw content."""
         text = f"Source {self.reference}\n"
         return text + self._get_content_str()
@@ -119,7 +120,7 @@ class WebSource(Source):
     def url(self) -> str:
         return self.reference
 
-    def __str__(self):
+    def _render(self) -> str:
         text = f"Web Source {self.url}"
         if self.title is not None:
             text += f"\nTitle: {self.title}"
@@ -1,16 +1,18 @@
 import os
 from dataclasses import dataclass
-from typing import Sequence
+from typing import Sequence, TYPE_CHECKING
 
 from ezmm import Image
-from google.auth.exceptions import DefaultCredentialsError
-from google.cloud import vision
 
 from config.globals import google_service_account_key_path
 from defame.common import logger
 from defame.evidence_retrieval.integrations.search.common import WebSource, Query, SearchMode, SearchResults
+from defame.utils.lazy import LazyObject
 from defame.utils.parsing import get_base_domain
 
+if TYPE_CHECKING:
+    from google.cloud import vision
+
 
 @dataclass
 class GoogleRisResults(SearchResults):
@@ -50,6 +52,11 @@ class GoogleVisionAPI:
     """Wraps the Google Cloud Vision API for performing reverse image search (RIS)."""
 
     def __init__(self):
+        # Imported here as the Google Cloud SDK is slow to import
+        from google.auth.exceptions import DefaultCredentialsError
+        from google.cloud import vision
+
+        self.vision = vision
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = google_service_account_key_path.as_posix()
         try:
             self.client = vision.ImageAnnotatorClient()
@@ -63,7 +70,7 @@ class GoogleVisionAPI:
         """Run image reverse search through Google Vision API and parse results."""
         assert query.has_image(), "Google Vision API requires an image in the query."
 
-        image = vision.Image(content=query.image.get_base64_encoded())
+        image = self.vision.Image(content=query.image.get_base64_encoded())
         response = self.client.web_detection(image=image)
         if response.error.message:
             logger.warning(f"{response.error.message}\nCheck Google Cloud Vision API documentation for more info.")
@@ -71,10 +78,10 @@ class GoogleVisionAPI:
         return _parse_results(response.web_detection, query)
 
 
-google_vision_api = GoogleVisionAPI()
+google_vision_api = LazyObject(GoogleVisionAPI)  # connects on first use
 
 
-def _parse_results(web_detection: vision.WebDetection, query: Query) -> GoogleRisResults:
+def _parse_results(web_detection: "vision.WebDetection", query: Query) -> GoogleRisResults:
     """Parse Google Vision API web detection results into SearchResult instances."""
 
     # Web Entities
@@ -2,16 +2,15 @@ import json
 import os.path
 import pickle
 import shutil
+import threading
 import zipfile
 from datetime import datetime
 from multiprocessing import Pool, Queue
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from urllib.request import urlretrieve
 
 import langdetect
-import torch
 from ezmm import MultimodalSequence
-from sklearn.neighbors import NearestNeighbors
 from tqdm import tqdm
 
 from config.globals import data_root_dir, embedding_model
@@ -21,6 +20,10 @@ from defame.evidence_retrieval.integrations.search.local_search_platform import
 from defame.utils.utils import my_hook
 from .common import SearchResults, Query, WebSource
 
+if TYPE_CHECKING:
+    import torch
+    from sklearn.neighbors import NearestNeighbors
+
 DOWNLOAD_URLS = {
     "dev": [
         "https://huggingface.co/chenxwh/AVeriTeC/resolve/main/data_store/knowledge_store/dev_knowledge_store.zip"
@@ -54,11 +57,11 @@ class KnowledgeBase(LocalSearchPlatform):
     description = """The AVeriTeC Knowledge Base (KB). It simulates a web search engine
         similar to Google. It accepts and returns only textual queries/sources."""
 
-    embedding_knns: dict[int, NearestNeighbors]
+    embedding_knns: dict[int, "NearestNeighbors"]
     embedding_model: EmbeddingModel = None
 
     def __init__(self, variant,
-                 device: str | torch.device = None,
+                 device: "str | torch.device" = None,
                  max_search_results: int = None):
         super().__init__()
         self.variant = variant
@@ -78,8 +81,10 @@ class KnowledgeBase(LocalSearchPlatform):
         # For speeding up data loading
         self.cached_resources = None
         self.cached_resources_claim_id = None
+        self._resources_lock = threading.Lock()
 
         self.device = device
+        self._embedding_lock = threading.Lock()
 
         self._load()
 
@@ -103,48 +108,54 @@ class KnowledgeBase(LocalSearchPlatform):
         """Returns the list of resources for the currently active claim ID."""
         claim_id = self.current_claim_id if claim_id is None else claim_id
 
-        if self.cached_resources_claim_id != claim_id:
-            # Load resources from disk
-            resource_file_path = self.resources_dir / f"{claim_id}.json"
-            resources = get_contents(resource_file_path)
+        with self._resources_lock:
+            if self.cached_resources_claim_id == claim_id:
+                return self.cached_resources
 
-            # Preprocess resource texts, keep only non-empty natural language resources
-            resources_preprocessed = []
-            for resource in resources:
-                text = "\n".join(resource["url2text"])
+        # Load resources from disk
+        resource_file_path = self.resources_dir / f"{claim_id}.json"
+        resources = get_contents(resource_file_path)
 
-                # Only keep samples with non-zero text length
-                if not text:
-                    continue
+        # Preprocess resource texts, keep only non-empty natural language resources
+        resources_preprocessed = []
+        for resource in resources:
+            text = "\n".join(resource["url2text"])
+
+            # Only keep samples with non-zero text length
+            if not text:
+                continue
 
-                if len(text) < 512:
-                    try:
-                        lang = langdetect.detect(text)
-                    except langdetect.LangDetectException as e:
-                        lang = None
+            if len(text) < 512:
+                try:
+                    lang = langdetect.detect(text)
+                except langdetect.LangDetectException as e:
+                    lang = None
 
-                    if lang is None:
-                        # Sample does not contain any meaningful natural language, therefore omit it
-                        continue
+                if lang is None:
+                    # Sample does not contain any meaningful natural language, therefore omit it
+                    continue
 
-                resource["url2text"] = text
-                resources_preprocessed.append(resource)
+            resource["url2text"] = text
+            resources_preprocessed.append(resource)
 
-            # Save into cache for efficiency
+        # Save into cache for efficiency
+        with self._resources_lock:
             self.cached_resources = resources_preprocessed
             self.cached_resources_claim_id = claim_id
 
-        return self.cached_resources
+        return resources_preprocessed
 
     def _embed(self, *args, **kwargs):
-        if self.embedding_model is None:
-            self._setup_embedding_model()
-        return self.embedding_model.embed(*args, **kwargs)
+        with self._embedding_lock:
+            if self.embedding_model is None:
+                self._setup_embedding_model()
+            return self.embedding_model.embed(*args, **kwargs)
 
     def _embed_many(self, *args, **kwargs):
-        if self.embedding_model is None:
-            self._setup_embedding_model()
-        return self.embedding_model.embed_many(*args, batch_size=32, **kwargs)
+        with self._embedding_lock:
+            if self.embedding_model is None:
+                self._setup_embedding_model()
+            return self.embedding_model.embed_many(*args, batch_size=32, **kwargs)
 
     def _setup_embedding_model(self):
         self.embedding_model = EmbeddingModel(embedding_model, device=self.device)
@@ -230,6 +241,7 @@ class KnowledgeBase(LocalSearchPlatform):
             print("Found extracted resource files.")
 
         if not self.embedding_knns_path.exists():
+            import torch
             n_workers = torch.cuda.device_count()
 
             print(f"Constructing kNNs for embeddings using {n_workers} workers...")
@@ -257,6 +269,8 @@ class KnowledgeBase(LocalSearchPlatform):
             self.resource_queue.put((claim_id, resources))
 
     def _train_embedding_knn(self):
+        from sklearn.neighbors import NearestNeighbors
+
         print("Fitting the k nearest neighbor learners...")
 
         # Re-initialize connections (threads need to do that for any SQLite object anew)
@@ -1,6 +1,7 @@
 import os
 import pickle
 import sqlite3
+import threading
 from pathlib import Path
 from typing import Optional
 
@@ -26,23 +27,31 @@ class RemoteSearchPlatform(SearchPlatform):
         self.path_to_cache = Path(temp_dir) / self.cache_file_name
         self.n_cache_hits = 0
         self.n_cache_write_errors = 0
+        self._local = threading.local()  # SQLite connections must not be shared across threads
 
         if self.search_cached_first:
             if is_new := not self.path_to_cache.exists():
                 os.makedirs(os.path.dirname(self.path_to_cache), exist_ok=True)
-            self.conn = sqlite3.connect(self.path_to_cache, timeout=10, check_same_thread=False)
-            # Enable Write-Ahead Logging (WAL) for concurrent access
-            self.conn.execute("PRAGMA journal_mode=WAL;")
-            self.cur = self.conn.cursor()
             if is_new:
                 self._init_db()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The cache connection of the current thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path_to_cache, timeout=10)
+            # Enable Write-Ahead Logging (WAL) for concurrent access
+            conn.execute("PRAGMA journal_mode=WAL;")
+            self._local.conn = conn
+        return conn
+
     def _init_db(self):
         """Initializes a clean, new DB."""
         stmt = f"""
             CREATE TABLE Query(hash TEXT PRIMARY KEY, results BLOB);
         """
-        self.cur.execute(stmt)
+        self.conn.execute(stmt)
         self.conn.commit()
 
     def _add_to_cache(self, query: Query, search_result: SearchResults):
@@ -52,17 +61,18 @@ class RemoteSearchPlatform(SearchPlatform):
             VALUES (?, ?);
         """
         try:
-            self.cur.execute(stmt, (hash(query), pickle.dumps(search_result)))
+            self.conn.execute(stmt, (hash(query), pickle.dumps(search_result)))
             self.conn.commit()
-        except sqlite3.IntegrityError | sqlite3.OperationalError:
-            self.n_cache_write_errors += 1
+        except (sqlite3.IntegrityError, sqlite3.OperationalError):
+            with self._stats_lock:
+                self.n_cache_write_errors += 1
 
     def _get_from_cache(self, query: Query) -> Optional[SearchResults]:
         """Search the local in-memory data for matching results."""
         stmt = f"""
             SELECT results FROM Query WHERE hash = ?;
         """
-        response = self.cur.execute(stmt, (hash(query),))
+        response = self.conn.execute(stmt, (hash(query),))
         result = response.fetchone()
         if result is not None:
             return pickle.loads(result[0])
@@ -72,7 +82,8 @@ class RemoteSearchPlatform(SearchPlatform):
         if self.search_cached_first:
             cache_results = self._get_from_cache(query)
             if cache_results:
-                self.n_cache_hits += 1
+                with self._stats_lock:
+                    self.n_cache_hits += 1
                 return cache_results
 
         # Run actual search
@@ -85,6 +96,11 @@ class RemoteSearchPlatform(SearchPlatform):
         self.n_cache_hits = 0
         self.n_cache_write_errors = 0
 
+    def merge_stats(self, other: "RemoteSearchPlatform"):
+        super().merge_stats(other)
+        self.n_cache_hits += other.n_cache_hits
+        self.n_cache_write_errors += other.n_cache_write_errors
+
     @property
     def stats(self) -> dict:
         stats = super().stats
@@ -1,3 +1,5 @@
+import copy
+import threading
 from abc import ABC
 from typing import Optional
 
@@ -14,10 +16,12 @@ class SearchPlatform(ABC):
 
     def __init__(self):
         self.n_searches = 0
+        self._stats_lock = threading.Lock()  # searches may run in parallel threads
         assert self.name is not None
 
     def _before_search(self, query: Query):
-      self.n_searches += 1
+      with self._stats_lock:
+          self.n_searches += 1
       log_message = f"Searching {self.name} with query: {query}"
       if hasattr(query, 'reasoning') and query.reasoning:
           log_message += f"\nReasoning: {query.reasoning}"
@@ -37,6 +41,18 @@ class SearchPlatform(ABC):
         """Resets the search API to its initial state (if applicable) and sets all stats to zero."""
         self.n_searches = 0
 
+    def fork(self) -> "SearchPlatform":
+        """Returns a copy of this platform with separate stats. The copy shares the
+        thread-safe resources, like the DB connections and the embedding model."""
+        platform = copy.copy(self)
+        platform._stats_lock = threading.Lock()
+        platform.reset()
+        return platform
+
+    def merge_stats(self, other: "SearchPlatform"):
+        """Adds the stats of `other`, a copy of this platform, to the stats of this platform."""
+        self.n_searches += other.n_searches
+
     @property
     def stats(self) -> dict:
         return {"Searches (API Calls)": self.n_searches}
@@ -2,14 +2,13 @@ import os
 import pickle
 import sqlite3
 import struct
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Sequence, Optional
+from typing import Sequence, Optional, TYPE_CHECKING
 
 import numpy as np
-import pandas as pd
 from ezmm import MultimodalSequence
-from sklearn.neighbors import NearestNeighbors
 from tqdm import tqdm
 
 from config.globals import embedding_model
@@ -17,6 +16,10 @@ from defame.common.embedding import EmbeddingModel
 from defame.evidence_retrieval.integrations.search.local_search_platform import LocalSearchPlatform
 from .common import SearchResults, Query, WebSource
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.neighbors import NearestNeighbors
+
 
 class SemanticSearchDB(LocalSearchPlatform):
     def __init__(self, db_file_path: str | Path):
@@ -24,37 +27,58 @@ class SemanticSearchDB(LocalSearchPlatform):
         self.is_free = True
         self.db_file_path = db_file_path
         self.embedding_model = None
+        self._embedding_lock = threading.Lock()
+        self._local = threading.local()  # SQLite connections must not be shared across threads
         if not os.path.exists(self.db_file_path):
             print(f"Warning: No {self.name} database found at '{self.db_file_path}'. Creating new one.")
         os.makedirs(os.path.dirname(self.db_file_path), exist_ok=True)
-        self.db = sqlite3.connect(self.db_file_path, uri=True)
-        self.cur = self.db.cursor()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The DB connection of the current thread."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_file_path, uri=True)
+            self._local.db = db
+        return db
+
+    @property
+    def cur(self) -> sqlite3.Cursor:
+        """The DB cursor of the current thread."""
+        cur = getattr(self._local, "cur", None)
+        if cur is None:
+            cur = self.db.cursor()
+            self._local.cur = cur
+        return cur
 
     def is_empty(self) -> bool:
         """Returns True iff the database is empty."""
         raise NotImplementedError
 
     def _embed(self, *args, **kwargs):
-        if self.embedding_model is None:
-            self._setup_embedding_model()
-        return self.embedding_model.embed(*args, **kwargs)
+        with self._embedding_lock:
+            if self.embedding_model is None:
+                self._setup_embedding_model()
+            return self.embedding_model.embed(*args, **kwargs)
 
     def _embed_many(self, *args, **kwargs):
-        if self.embedding_model is None:
-            self._setup_embedding_model()
-        return self.embedding_model.embed_many(*args, **kwargs)
+        with self._embedding_lock:
+            if self.embedding_model is None:
+                self._setup_embedding_model()
+            return self.embedding_model.embed_many(*args, **kwargs)
 
     def _setup_embedding_model(self):
         self.embedding_model = EmbeddingModel(embedding_model)
 
-    def _restore_knn_from(self, path: str) -> NearestNeighbors:
+    def _restore_knn_from(self, path: str) -> "NearestNeighbors":
         with open(path, "rb") as f:
             return pickle.load(f)
 
     def _run_sql_query(self, stmt: str, *args) -> Sequence:
         """Runs the SQL statement stmt (with optional arguments) on the DB and returns the rows."""
-        self.cur.execute(stmt, args)
-        rows = self.cur.fetchall()
+        cur = self.cur
+        cur.execute(stmt, args)
+        rows = cur.fetchall()
         return rows
 
     def _call_api(self, query: Query) -> Optional[SearchResults]:
@@ -90,7 +114,7 @@ class SemanticSearchDB(LocalSearchPlatform):
         raise NotImplementedError()
 
 
-def df_embedding_to_np_embedding(df: pd.DataFrame, dimension: int) -> np.array:
+def df_embedding_to_np_embedding(df: "pd.DataFrame", dimension: int) -> np.array:
     """Converts a Pandas DataFrame of binary embeddings into the respective
     NumPy array with shape (num_instances, dimension) containing the unpacked embeddings."""
     embeddings = np.zeros(shape=(len(df), dimension), dtype="float32")
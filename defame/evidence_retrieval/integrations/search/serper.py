@@ -15,6 +15,7 @@ import requests
 from config.globals import api_keys
 from defame.common import logger
 from defame.evidence_retrieval.integrations.search.common import SearchResults, Query, WebSource
+from defame.utils.lazy import LazyObject
 from defame.utils.parsing import get_base_domain
 
 _SERPER_URL = 'https://google.serper.dev'
@@ -160,7 +161,7 @@ class SerperAPI:
         return sources
 
 
-serper_api = SerperAPI()
+serper_api = LazyObject(SerperAPI)
 
 
 def _parse_answer_box(response: dict) -> Optional[str]:
@@ -6,9 +6,7 @@ from multiprocessing import Pool as ProcessPool
 from datetime import datetime
 
 import numpy as np
-import pandas as pd
 import unicodedata
-from sklearn.neighbors import NearestNeighbors
 from tqdm import tqdm
 
 from config.globals import data_root_dir
@@ -41,6 +39,9 @@ class WikiDump(SemanticSearchDB):
         print("done.")
 
     def _build_knn(self):
+        import pandas as pd
+        from sklearn.neighbors import NearestNeighbors
+
         stmt = "SELECT ROWID, title_embedding, body_embedding FROM articles ORDER BY ROWID"
         embeddings = pd.read_sql_query(stmt, self.db)
         print("Reading title embeddings...")
@@ -68,6 +69,7 @@ class WikiDump(SemanticSearchDB):
         indices = np.asarray([indices_title, indices_body]).flatten()
         distances = np.asarray([distances_title, distances_body]).flatten()
 
+        import pandas as pd
         df = pd.DataFrame(data=dict(indices=indices, distances=distances))
         df.drop_duplicates(subset="indices", keep="first", inplace=True)
         df.sort_values(by="distances", inplace=True)
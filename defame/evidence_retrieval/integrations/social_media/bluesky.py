@@ -22,6 +22,9 @@ class Bluesky(RetrievalIntegration):
 
     def __init__(self, username: str, password: str):
         super().__init__()
+        self.authenticated = False
+        self.n_api_calls = 0
+        self.n_errors = 0
         if not username or not password:
             logger.error("Bluesky username and password must be provided in api_keys.yaml")
             print("Warning: Bluesky credentials not found. Bluesky integration will be disabled.") 
@@ -30,16 +33,12 @@ class Bluesky(RetrievalIntegration):
 
         self.username = username
         self.password = password
-        self.n_api_calls = 0
-        self.n_errors = 0
-        self.authenticated = False
-        self.client = Client()
-        self._authenticate()
+        self.client = Client()  # logs in on first retrieval, keeping imports fast
 
     def _retrieve(self, url: str) -> SocialMediaPost | SocialMediaProfile | None:
         """Retrieve a post from the given URL."""
-        if not self.authenticated:
-            raise "Bluesky API is not authenticated."
+        if not self.authenticated and not self._authenticate():
+            raise RuntimeError("Bluesky API is not authenticated.")
 
         if "post" in url:
             result = self._retrieve_post(url)
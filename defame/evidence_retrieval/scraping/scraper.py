@@ -14,6 +14,7 @@ from defame.evidence_retrieval.scraping.excluded import (is_unsupported_site, is
                                                          is_fact_checking_site)
 from defame.evidence_retrieval.scraping.util import scrape_naive, find_firecrawl, firecrawl_is_running, log_error_url, \
     resolve_media_hyperlinks
+from defame.utils.lazy import LazyObject
 from defame.utils.parsing import get_domain
 from defame.utils.requests import download, is_image_url
 
@@ -193,7 +194,7 @@ def _retrieve_via_integration(url: str) -> Optional[MultimodalSequence]:
         return integration.retrieve(url)
 
 
-scraper = Scraper()
+scraper = LazyObject(Scraper)  # created on first use as locating Firecrawl takes a while
 
 if __name__ == "__main__":
     print(scrape_naive("https://www.independent.co.uk/news/world/africa/sahara-desert-snow-first-40-years-rare-photos-atlas-mountains-algeria-karim-bouchetata-a7488056.html"))
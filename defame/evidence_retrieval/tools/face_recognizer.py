@@ -1,12 +1,14 @@
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
-import torch
 from ezmm import MultimodalSequence, Image
 
 from defame.common import Action, logger
 from defame.common.results import Results
 from defame.evidence_retrieval.tools.tool import Tool
 
+if TYPE_CHECKING:
+    import torch
+
 
 class FaceRecognition(Action):
     """Identifies and recognizes faces within an image."""
@@ -44,7 +46,7 @@ class FaceRecognizer(Tool):
     def _perform(self, action: FaceRecognition) -> Results:
         return self.recognize_faces(action.image)
 
-    def recognize_faces(self, image: torch.Tensor) -> Results:
+    def recognize_faces(self, image: "torch.Tensor") -> Results:
         # TODO: Implement this method
         # results = self.model(image)
         # faces = [result['label'] for result in results]
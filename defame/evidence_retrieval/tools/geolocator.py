@@ -1,10 +1,8 @@
 from dataclasses import dataclass
 from typing import List, Optional
 
-import torch
 from PIL.Image import Image as PILImage
 from ezmm import MultimodalSequence, Image
-from transformers import AutoProcessor, AutoModel
 
 from defame.common import Action, Results, logger
 from defame.evidence_retrieval.tools.tool import Tool
@@ -54,6 +52,7 @@ class Geolocator(Tool):
     name = "geolocator"
     actions = [Geolocate]
     summarize = False
+    max_parallelism = 1  # the local model processes one input at a time
 
     def __init__(self, model_name: str = "geolocal/StreetCLIP", top_k=10, **kwargs):
         super().__init__(**kwargs)
@@ -65,6 +64,9 @@ class Geolocator(Tool):
         :param use_multiple_gpus: Whether to use multiple GPUs if available.
         """
         # FIXME: Print warning if no GPU available
+        import torch
+        from transformers import AutoProcessor, AutoModel
+
         logger.log("Initializing geolocator...")
         self.model_name = model_name
         self.processor = AutoProcessor.from_pretrained(model_name)
@@ -101,6 +103,8 @@ class Geolocator(Tool):
                        'United Arab Emirates',
                        'United Kingdom', 'United States', 'Uruguay']
 
+        import torch
+
         inputs = self.processor(text=choices, images=image, return_tensors="pt", padding=True).to(self.device)
         with torch.no_grad():
             outputs = self.model(**inputs)
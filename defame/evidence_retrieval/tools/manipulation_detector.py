@@ -1,14 +1,12 @@
 from dataclasses import dataclass, field
 from typing import Optional
 
-import torch
 from PIL.Image import Image as PILImage
 from ezmm import Image, MultimodalSequence
 
 from config.globals import manipulation_detection_model
 from defame.common import Results, Action
 from defame.evidence_retrieval.tools.tool import Tool
-from third_party.TruFor.src.fake_detect_tool import analyze_image, create_visualizations
 from defame.prompts.prompts import SummarizeManipulationResultPrompt
 
 
@@ -62,6 +60,7 @@ class ManipulationDetector(Tool):
     name = "manipulation_detector"
     actions = [DetectManipulation]
     summarize = False
+    max_parallelism = 1  # the local model processes one input at a time
 
     def __init__(self, model_file: str = manipulation_detection_model, **kwargs):
         super().__init__(**kwargs)
@@ -71,6 +70,8 @@ class ManipulationDetector(Tool):
         :param model_file: The path to the model file.
         :param device: The device to run the model on (e.g., "cpu" or "cuda").
         """
+        import torch
+
         self.model_file = model_file
         self.device = torch.device(self.device if self.device else ('cuda' if torch.cuda.is_available() else 'cpu'))
 
@@ -90,6 +91,8 @@ class ManipulationDetector(Tool):
         :param image: A PIL image.
         :return: A dictionary containing the results of the manipulation detection.
         """
+        from third_party.TruFor.src.fake_detect_tool import analyze_image, create_visualizations
+
         result = analyze_image(image)
         result = create_visualizations(result)
         return result
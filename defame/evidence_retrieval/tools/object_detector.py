@@ -1,10 +1,8 @@
 from dataclasses import dataclass, field
 from typing import List, Optional
 
-import torch
 from PIL.Image import Image as PILImage
 from ezmm import Image, MultimodalSequence
-from transformers import AutoProcessor, AutoModelForObjectDetection
 
 from defame.common import Results, Action, logger
 from defame.evidence_retrieval.tools.tool import Tool
@@ -57,6 +55,7 @@ class ObjectDetector(Tool):
     name = "object_detector"
     actions = [DetectObjects]
     summarize = False
+    max_parallelism = 1  # the local model processes one input at a time
 
     def __init__(self, model_name: str = "facebook/detr-resnet-50", **kwargs):
         super().__init__(**kwargs)
@@ -67,6 +66,9 @@ class ObjectDetector(Tool):
         :param device: The device to run the model on (e.g., -1 for CPU, 0 for GPU).
         :param use_multiple_gpus: Whether to use multiple GPUs if available.
         """
+        import torch
+        from transformers import AutoProcessor, AutoModelForObjectDetection
+
         self.model_name = model_name
         self.processor = AutoProcessor.from_pretrained(model_name)
         self.model = AutoModelForObjectDetection.from_pretrained(model_name)
@@ -83,6 +85,8 @@ class ObjectDetector(Tool):
         :param image: A PIL image.
         :return: An ObjectDetectionResult instance containing recognized objects and their bounding boxes.
         """
+        import torch
+
         with torch.no_grad():
             inputs = self.processor(images=image, return_tensors="pt").to(self.device)
             outputs = self.model(**inputs)
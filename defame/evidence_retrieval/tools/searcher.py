@@ -1,4 +1,7 @@
+import asyncio
+import copy
 import re
+import threading
 from datetime import datetime, timedelta, date
 from typing import Any, Optional
 
@@ -7,12 +10,14 @@ from jinja2.exceptions import TemplateSyntaxError
 from openai import APIError
 
 from config.globals import api_keys
-from defame.common import Report, Prompt, logger, Action
+from defame.common import Report, Prompt, logger, Action, Model
 from defame.evidence_retrieval import scraper
+from defame.evidence_retrieval.evidence_pool import EvidencePool
 from defame.evidence_retrieval.integrations.search import SearchResults, SearchPlatform, PLATFORMS, KnowledgeBase
 from defame.evidence_retrieval.integrations.search.common import Query, SearchMode, Source, WebSource
 from defame.evidence_retrieval.tools.tool import Tool
 from defame.prompts.prompts import SummarizeSourcePrompt
+from defame.utils.aio import run_sync
 from defame.utils.console import gray
 
 
@@ -121,16 +126,23 @@ class Searcher(Tool):
                  limit_per_search: int = 5,
                  max_result_len: int = None,  # chars
                  extract_sentences: bool = False,
+                 max_parallel_summaries: int = 5,
                  **kwargs):
+        """
+        @param max_parallel_summaries: The max. number of sources summarized concurrently.
+        """
         super().__init__(**kwargs)
 
         self.limit_per_search = limit_per_search
         self.max_result_len = max_result_len  # chars
         self.extract_sentences = extract_sentences
+        self.max_parallel_summaries = max_parallel_summaries
         self.restrict_results_before_time: Optional[datetime] = None  # date restriction for all search actions
 
         self.platforms = self._initialize_platforms(search_config)
         self.known_sources: set[Source] = set()
+        self._lock = threading.Lock()  # guards the known sources and stats during parallel searches
+        self.evidence_pool: Optional[EvidencePool] = None  # shared with the searchers of sibling claims
 
         self.actions = self._define_actions()
 
@@ -208,11 +220,14 @@ class Searcher(Tool):
         # Run search and retrieve sources
         results = platform.search(query)
         sources = results.sources[:self.limit_per_search]
-        self.n_retrieved_results += len(sources)
 
-        # Remove known sources
-        sources = self._remove_known_sources(sources)
-        self.n_unique_retrieved_results += len(sources)
+        # Remove known sources and register the new ones at once so that parallel
+        # searches don't process the same source twice
+        with self._lock:
+            self.n_retrieved_results += len(sources)
+            sources = self._remove_known_sources(sources)
+            self._register_sources(sources)
+            self.n_unique_retrieved_results += len(sources)
 
         # Log search results
         if len(sources) > 0:
@@ -223,16 +238,29 @@ class Searcher(Tool):
 
         # Scrape the pages of the results
         sources_to_scrape = [s for s in sources if isinstance(s, WebSource)]
-        scraper.scrape_sources(sources_to_scrape)
+        self._scrape_sources(sources_to_scrape)
 
         # Modify the raw source text to avoid jinja errors when used in prompt
         self._postprocess_sources(sources, query)
-        self._register_sources(sources)
 
         if len(sources) > 0:
             results.sources = sources
             return results
 
+    def _scrape_sources(self, sources: list[WebSource]):
+        """Scrapes the sources, re-using the contents available in the evidence pool."""
+        if self.evidence_pool is None:
+            scraper.scrape_sources(sources)
+            return
+
+        for source in sources:
+            if not source.is_loaded():
+                source.content = self.evidence_pool.get_content(source.url)
+        to_scrape = [source for source in sources if not source.is_loaded()]
+        scraper.scrape_sources(to_scrape)
+        for source in to_scrape:
+            self.evidence_pool.add_content(source.url, source.content)
+
     def _remove_known_sources(self, sources: list[Source]) -> list[Source]:
         """Removes already known sources from the list `sources`."""
         return [r for r in sources if r not in self.known_sources]
@@ -277,17 +305,26 @@ class Searcher(Tool):
     def _summarize(self, results: SearchResults, doc: Report = None) -> Optional[MultimodalSequence]:
         assert doc is not None
         if results:
-            for source in results.sources:
-                self._summarize_single_source(source, doc)
+            run_sync(self._summarize_sources(results.sources, doc))
             return self._summarize_summaries(results, doc)
         else:
             return None
 
-    def _summarize_single_source(self, source: Source, doc: Report):
+    async def _summarize_sources(self, sources: list[Source], doc: Report):
+        """Summarizes the sources concurrently, at most `max_parallel_summaries` at a time."""
+        semaphore = asyncio.Semaphore(max(self.max_parallel_summaries, 1))
+
+        async def summarize(source: Source):
+            async with semaphore:
+                await self._summarize_single_source(source, doc)
+
+        await asyncio.gather(*[summarize(source) for source in sources])
+
+    async def _summarize_single_source(self, source: Source, doc: Report):
         prompt = SummarizeSourcePrompt(source, doc)
 
         try:
-            summary = self.llm.generate(prompt, max_attempts=3)
+            summary = await self.llm.agenerate(prompt, max_attempts=3)
             if not summary:
                 summary = "NONE"
         except APIError as e:
@@ -327,7 +364,7 @@ class Searcher(Tool):
         # Prepare the prompt for the LLM
         placeholder_targets = {
             "[SUMMARIES]": str(result),
-            "[DOC]": str(doc),
+            "[DOC]": doc,
         }
         summarize_prompt = Prompt(placeholder_targets=placeholder_targets,
                                   name="SummarizeSummariesPrompt",
@@ -346,6 +383,21 @@ class Searcher(Tool):
             if platform.name == name:
                 return platform
 
+    def fork(self, llm: Model = None) -> "Searcher":
+        searcher = copy.copy(self)
+        searcher.platforms = [platform.fork() for platform in self.platforms]
+        searcher._lock = threading.Lock()
+        if llm is not None:
+            searcher.llm = llm
+        searcher.reset()
+        return searcher
+
+    def merge_stats(self, other: "Searcher") -> None:
+        self.n_retrieved_results += other.n_retrieved_results
+        self.n_unique_retrieved_results += other.n_unique_retrieved_results
+        for platform, other_platform in zip(self.platforms, other.platforms):
+            platform.merge_stats(other_platform)
+
     def set_time_restriction(self, before: Optional[datetime]):
         self.restrict_results_before_time = before
 
@@ -1,20 +1,31 @@
+import copy
+import threading
 from abc import ABC
-from typing import Any, Optional
+from contextlib import nullcontext
+from typing import Any, Optional, TYPE_CHECKING
 
-import torch
 from ezmm import MultimodalSequence
 
 from defame.common import Action, Results, Evidence, Model
 
+if TYPE_CHECKING:
+    import torch
+
 
 class Tool(ABC):
     """Base class for all tools. Tools leverage integrations to retrieve evidence."""
     name: str
     actions: list[type(Action)]  # (classes of the) available actions this tool offers
+    max_parallelism: Optional[int] = None  # max. number of concurrently performed actions, unlimited if None
 
-    def __init__(self, llm: Model = None, device: str | torch.device = None):
+    def __init__(self, llm: Model = None, device: "str | torch.device" = None, max_parallelism: int = None):
         self.device = device
         self.llm = llm
+        if max_parallelism is not None:
+            self.max_parallelism = max_parallelism
+        # Shared by all forks of this tool
+        self.parallelism_limit = threading.BoundedSemaphore(self.max_parallelism) \
+            if self.max_parallelism is not None else nullcontext()
 
         self.current_claim_id: Optional[str] = None  # used by few tools to adjust claim-specific behavior
 
@@ -45,6 +56,19 @@ class Tool(ABC):
     def set_claim_id(self, claim_id: str):
         self.current_claim_id = claim_id
 
+    def fork(self, llm: Model = None) -> "Tool":
+        """Returns a copy of this tool with separate state and stats, sharing the expensive
+        resources like loaded models. Enables to verify multiple claims concurrently."""
+        tool = copy.copy(self)
+        if llm is not None:
+            tool.llm = llm
+        tool.reset()
+        return tool
+
+    def merge_stats(self, other: "Tool") -> None:
+        """Adds the stats of `other`, a fork of this tool, to the stats of this tool."""
+        pass
+
 
 def get_available_actions(tools: list[Tool], available_actions: Optional[list[Action]]) -> set[type[Action]]:
     actions = set()
@@ -1,15 +1,23 @@
+import copy
+import hashlib
+import json
 import multiprocessing
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Sequence, Any
 from datetime import datetime
+from pathlib import Path
 
 import numpy as np
 from ezmm import Item
 
 from defame.common import logger, Claim, Content, Report, Label, Action, Model
+from defame.common.checkpoint import Checkpoint
 from defame.common.label import DEFAULT_LABEL_DEFINITIONS
 from defame.common.modeling import make_model
+from defame.common.report import REPORT_FORMATS, ReportExporter
+from defame.common.verdict_cache import VerdictCache
 from defame.modules.actor import Actor
 from defame.modules.claim_extractor import ClaimExtractor
 from defame.modules.doc_summarizer import DocSummarizer
@@ -17,6 +25,7 @@ from defame.modules.judge import Judge
 from defame.modules.planner import Planner
 from defame.procedure import get_procedure
 from defame.evidence_retrieval import scraper, Tool
+from defame.evidence_retrieval.evidence_pool import EvidencePool
 from defame.evidence_retrieval.tools import initialize_tools
 from defame.evidence_retrieval.tools.tool import get_available_actions
 from defame.utils.console import gray, light_blue, bold, sec2mmss
@@ -47,7 +56,36 @@ class FactChecker:
                  extra_prepare_rules: str = None,
                  extra_plan_rules: str = None,
                  extra_judge_rules: str = None,
+                 max_concurrent_claims: int = 1,
+                 max_parallel_actions: int = 8,
+                 max_parallel_questions: int = 4,
+                 n_speculative_answers: int = 1,
+                 report_formats: Sequence[str] = REPORT_FORMATS,
+                 use_verdict_cache: bool = False,
+                 verdict_cache_kwargs: dict = None,
+                 save_checkpoints: bool = False,
                  device: str = None):
+        """
+        @param max_concurrent_claims: The max. number of claims (extracted from the same
+            content) that get verified in parallel. Each claim gets its own copy of the
+            modules and tools, so their state and statistics remain separate.
+        @param max_parallel_actions: The max. number of actions (of the same plan)
+            executed concurrently. See also the tools' `max_parallelism`.
+        @param max_parallel_questions: The max. number of questions answered concurrently
+            by Q&A-based procedures like InFact.
+        @param n_speculative_answers: The number of search results from which Q&A-based
+            procedures attempt to answer a question concurrently.
+        @param report_formats: The formats in which the fact-checking reports get saved,
+            any of "md", "media", and "pdf". PDFs are rendered in the background.
+        @param use_verdict_cache: If True, the results of verified claims are stored in a
+            persistent cache. Claims checked before (with the same configuration) re-use
+            the cached Report instead of getting verified again.
+        @param verdict_cache_kwargs: Arguments for the VerdictCache, e.g., the
+            `similarity_threshold` to also re-use the results of near-duplicate claims.
+        @param save_checkpoints: If True, the progress of each claim's verification is saved
+            after each completed stage. An interrupted verification of the same claim
+            then resumes from the last checkpoint.
+                """
 
         if tools_config is None:
             tools_config = dict(searcher=None)
@@ -78,36 +116,78 @@ class FactChecker:
         self.max_iterations = max_iterations
         self.max_result_len = max_result_len
         self.restrict_results_to_claim_date = restrict_results_to_claim_date
+        self.max_concurrent_claims = max_concurrent_claims
+        self.max_parallel_actions = max_parallel_actions
+        self.max_parallel_questions = max_parallel_questions
+        self.n_speculative_answers = n_speculative_answers
+        self.report_exporter = ReportExporter(report_formats)
+        self.save_checkpoints = save_checkpoints
         scraper.allow_fact_checking_sites = allow_fact_checking_sites
 
         if tools is None:
             tools = initialize_tools(tools_config, llm=self.llm)
 
-        available_actions = get_available_actions(tools, available_actions)
-
-        # Initialize fact-checker modules
-        self.planner = Planner(valid_actions=available_actions,
+        self.available_actions = get_available_actions(tools, available_actions)
+        self.classes = classes
+        self.class_definitions = class_definitions
+        self.extra_plan_rules = extra_plan_rules
+        self.extra_judge_rules = extra_judge_rules
+        self.procedure_variant = procedure_variant or self.default_procedure
+
+        self._initialize_modules(tools)
+
+        self.verdict_cache = VerdictCache(**(verdict_cache_kwargs or {})) if use_verdict_cache else None
+        self.config_fingerprint = self._get_config_fingerprint()
+
+    def _get_config_fingerprint(self) -> str:
+        """Returns a string identifying all settings that influence the verification of
+        a claim. Claims are re-verified when this changes, see VerdictCache."""
+        config = dict(llm=self.llm.name,
+                      procedure=self.procedure_variant,
+                      tools=sorted(tool.name for tool in self.actor.tools),
+                      actions=sorted(action.name for action in self.available_actions),
+                      classes=[label.name for label in self.classes],
+                      class_definitions={label.name: definition for label, definition in
+                                         (self.class_definitions or {}).items()},
+                      max_iterations=self.max_iterations,
+                      max_result_len=self.max_result_len,
+                      restrict_results_to_claim_date=self.restrict_results_to_claim_date,
+                      extra_plan_rules=self.extra_plan_rules,
+                      extra_judge_rules=self.extra_judge_rules)
+        return json.dumps(config, sort_keys=True, default=str)
+
+    def _initialize_modules(self, tools: list[Tool]):
+        """Initializes all fact-checker modules involved in verifying a claim."""
+        self.planner = Planner(valid_actions=self.available_actions,
                                llm=self.llm,
-                               extra_rules=extra_plan_rules)
+                               extra_rules=self.extra_plan_rules)
 
-        self.actor = Actor(tools=tools)
+        self.actor = Actor(tools=tools, max_parallel_actions=self.max_parallel_actions)
 
         self.judge = Judge(llm=self.llm,
-                           classes=classes,
-                           class_definitions=class_definitions,
-                           extra_rules=extra_judge_rules)
+                           classes=self.classes,
+                           class_definitions=self.class_definitions,
+                           extra_rules=self.extra_judge_rules)
 
         self.doc_summarizer = DocSummarizer(self.llm)
 
-        if procedure_variant is None:
-            procedure_variant = self.default_procedure
-
-        self.procedure = get_procedure(procedure_variant,
+        self.procedure = get_procedure(self.procedure_variant,
                                        llm=self.llm,
                                        actor=self.actor,
                                        judge=self.judge,
                                        planner=self.planner,
-                                       max_iterations=self.max_iterations)
+                                       max_iterations=self.max_iterations,
+                                       max_parallel_questions=self.max_parallel_questions,
+                                       n_speculative_answers=self.n_speculative_answers)
+
+    def fork(self) -> "FactChecker":
+        """Returns a fact-checker with its own modules, tool states, and statistics,
+        sharing the loaded models with this one. Used to verify claims in parallel."""
+        fact_checker = copy.copy(self)
+        fact_checker.llm = self.llm.fork()
+        tools = [tool.fork(llm=fact_checker.llm if tool.llm is self.llm else None) for tool in self.actor.tools]
+        fact_checker._initialize_modules(tools)
+        return fact_checker
 
     def extract_claims(self, content: Content | list[str | Item]) -> list[Claim]:
         if not isinstance(content, Content):
@@ -124,15 +204,31 @@ class FactChecker:
 
         claims = self.extract_claims(content)
 
+        # Let the claims share scraped web sources
+        evidence_pool = EvidencePool() if len(claims) > 1 else None
+        self.actor.set_evidence_pool(evidence_pool)
+
         # Verify each single extracted claim
+        try:
+            if self.max_concurrent_claims > 1 and len(claims) > 1:
+                n_threads = min(self.max_concurrent_claims, len(claims))
+                with ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="claim") as executor:
+                    results = list(executor.map(lambda c: self.fork().verify_claim(c), claims))
+            else:
+                results = [self.verify_claim(claim) for claim in claims]
+        finally:
+            self.actor.set_evidence_pool(None)
+
+        if evidence_pool is not None:
+            logger.log(f"Re-used {evidence_pool.n_reused_contents} scraped source(s) from the evidence pool.")
+
         docs = []
         metas = []
-        for claim in claims:  # TODO: parallelize
-            doc, meta = self.verify_claim(claim)
+        for doc, meta in results:
             docs.append(doc)
             metas.append(meta)
             target_dir = logger.target_dir if logger.target_dir else "out/fact_check"
-            doc.save_to(target_dir)
+            self.report_exporter.export(doc, target_dir)
 
         aggregated_veracity = aggregate_predictions([doc.verdict for doc in docs])
         logger.log(bold(f"So, the overall veracity is: {aggregated_veracity.value}"))
@@ -150,6 +246,11 @@ class FactChecker:
         logger.info(f"Verifying claim.", send=True)
         logger.info(f"{bold(str(claim))}")
 
+        if self.verdict_cache is not None:
+            cached = self.verdict_cache.get(claim, self.config_fingerprint)
+            if cached is not None:
+                return self._reuse_cached_result(claim, *cached)
+
         stats = {}
         self.actor.reset()  # remove all past search evidences
         self.actor.set_current_claim_id(claim.id)
@@ -164,13 +265,26 @@ class FactChecker:
         self.llm.reset_stats()
 
         start = time.time()
-        doc = Report(claim)
+        checkpoint = self._get_checkpoint(claim)
+        doc = checkpoint.load() if checkpoint is not None else None
+        if doc is not None:
+            logger.info("Resuming the fact-check from the last checkpoint.")
+            doc.claim = claim
+            self.judge.latest_reasoning = checkpoint.state.get("judge_reasoning")
+        else:
+            doc = Report(claim)
+        self.procedure.checkpoint = checkpoint
 
-        # Depending on the specified procedure variant, perform the fact-check
-        label, meta = self.procedure.apply_to(doc)
+        if checkpoint is not None and "result" in checkpoint.state:
+            label, meta = checkpoint.state["result"]
+        else:
+            # Depending on the specified procedure variant, perform the fact-check
+            label, meta = self.procedure.apply_to(doc)
 
-        # Finalize the fact-check
-        doc.add_reasoning("## Final Judgement\n" + self.judge.get_latest_reasoning())
+            # Finalize the fact-check
+            doc.add_reasoning("## Final Judgement\n" + self.judge.get_latest_reasoning())
+            if checkpoint is not None:
+                checkpoint.save(doc, result=(label, meta))
 
         # Summarize the fact-check and use the summary as justification
         if label == Label.REFUSED_TO_ANSWER:
@@ -185,6 +299,43 @@ class FactChecker:
         stats["Model"] = self.llm.get_stats()
         stats["Tools"] = self.actor.get_tool_stats()
         meta["Statistics"] = stats
+
+        if self.verdict_cache is not None and label != Label.REFUSED_TO_ANSWER:
+            self.verdict_cache.put(claim, self.config_fingerprint, doc, meta)
+
+        if checkpoint is not None:
+            checkpoint.clear()
+            self.procedure.checkpoint = None
+
+        return doc, meta
+
+    def _get_checkpoint(self, claim: Claim) -> Checkpoint | None:
+        """Returns the checkpoint of the claim's verification (if checkpointing is enabled),
+        identified by the claim ID or, if there is none, by the claim itself."""
+        if not self.save_checkpoints:
+            return None
+        name = claim.id if claim.id is not None else hashlib.sha256(str(claim).encode()).hexdigest()[:16]
+        target_dir = logger.target_dir if logger.target_dir else "out/fact_check"
+        return Checkpoint(Path(target_dir) / "checkpoints" / f"{name}.pkl", claim)
+
+    def _reuse_cached_result(self, claim: Claim, doc: Report, meta: dict,
+                             similarity: float) -> tuple[Report, dict[str, Any]]:
+        """Turns the cached result of a previous fact-check into the result for `claim`.
+        The statistics are zeroed as no LLM calls or tool usages were necessary."""
+        if similarity < 1:
+            logger.info(f"Re-using the cached verdict of a near-identical claim (similarity {similarity:.3f}).")
+        else:
+            logger.info("Re-using the cached verdict of the same claim.")
+        logger.info(bold(f"The claim '{light_blue(str(claim))}' is {doc.verdict.value}."))
+
+        doc.claim = claim
+        self.llm.reset_stats()
+        self.actor.reset()
+        meta = dict(meta)
+        meta["Statistics"] = {"Duration": 0.0,
+                              "Model": self.llm.get_stats(),
+                              "Tools": self.actor.get_tool_stats()}
+        meta["Verdict cache similarity"] = similarity
         return doc, meta
 
 
@@ -205,29 +356,3 @@ def aggregate_predictions(veracities: Sequence[Label]) -> Label:
         return Label.CHERRY_PICKING
     else:
         return Label.NEI
-
-class RateLimitedFactChecker(FactChecker):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.tokens_used_in_last_minute = 0
-        self.last_reset_time = time.time()
-        self.tpm_limit = 18000
-       
-    def verify_claim_with_rate_limit(self, claim):
-        current_time = time.time()
-        if current_time - self.last_reset_time >= 60:
-            self.tokens_used_in_last_minute = 0
-            self.last_reset_time = current_time
-       
-       # too close to limit, wait.
-        if self.tokens_used_in_last_minute > self.tpm_limit * 0.8:
-            wait_time = 60 - (current_time - self.last_reset_time)
-            if wait_time > 0:
-                print(f"Approaching rate limit. Waiting {wait_time:.1f} seconds...")
-                time.sleep(wait_time)
-                self.tokens_used_in_last_minute = 0
-                self.last_reset_time = time.time()
-     
-        report, meta = super().verify_claim(claim)
-       
-        return report, meta
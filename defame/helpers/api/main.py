@@ -6,6 +6,7 @@ from websockets import ConnectionClosed
 from starlette.websockets import WebSocketDisconnect
 
 from defame.common import logger
+from defame.common.report import render_pdf
 from .job_manager import JobManager
 from defame.helpers.parallelization.pool import Pool
 from .common import UserSubmission
@@ -82,17 +83,36 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
     """Delivers the current state immediately, followed by real-time updates (containing
     just the changes). Closes automatically when fact-check terminated. Can handle multiple
     connections for the same job concurrently."""
-    try:
-        job = job_manager.get_job(job_id)
+    job = job_manager.get_job(job_id)
+
+    # Get notified by the pool whenever any task changed
+    loop = asyncio.get_running_loop()
+    updated = asyncio.Event()
 
+    def on_update():
+        loop.call_soon_threadsafe(updated.set)
+
+    pool.add_update_listener(on_update)
+    disconnected = None
+
+    try:
         await websocket.accept()
+        disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
 
         # Send full job status
         job_status = job.get_status()
         await websocket.send_json(job_status)
 
         # Send changes in real-time while the job is running
-        while True:
+        while job_status["job_info"]["status"] not in ["DONE", "FAILED"]:
+            update_received = asyncio.create_task(updated.wait())
+            await asyncio.wait([update_received, disconnected], return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                update_received.cancel()
+                logger.log("Websocket client disconnected.")
+                return
+            updated.clear()
+
             new_status = job.get_status()
 
             # Report only the changes
@@ -101,17 +121,23 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
 
             job_status = new_status
 
-            # Check if job has terminated
-            if job_status["job_info"]["status"] in ["DONE", "FAILED"]:
-                break
-            else:
-                await asyncio.sleep(0.1)
-
+        disconnected.cancel()
         await websocket.close()
 
     except (ConnectionClosed, WebSocketDisconnect):
         logger.log("Websocket connection closed unexpectedly.")
 
+    finally:
+        if disconnected is not None:
+            disconnected.cancel()
+        pool.remove_update_listener(on_update)
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    """Returns as soon as the client disconnects. Ignores any messages sent by the client."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
 
 @app.get("/results/{job_id}",
          summary="Get the status/results of a previously submitted fact-checking job.",
@@ -147,7 +173,15 @@ async def get_report_pdf(job_id: str, claim_id: int):
             detail=detail
         )
 
-    report_path = save_dir / "fact-checks" / job_id / str(claim_id) / "report.pdf"
+    report_dir = save_dir / "fact-checks" / job_id / str(claim_id)
+    report_path = report_dir / "report.pdf"
+    if not report_path.exists():
+        # The PDF gets rendered only on first request (unless configured otherwise)
+        if not (report_dir / "report.md").exists():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"No report available for claim {job_id}/{claim_id}.")
+        await asyncio.to_thread(render_pdf, report_dir)
+
     with open(report_path, "rb") as f:
         pdf_bytes = f.read()
     headers = {'Content-Disposition': 'inline; filename="report.pdf"'}
@@ -0,0 +1,356 @@
+"""Hosts a single model instance in a dedicated process and serves the generation
+requests of many (lightweight) worker processes. Concurrent requests are combined
+dynamically into batches, so the workers share both the weights and the compute."""
+
+import asyncio
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Connection, Listener
+from queue import Queue, Empty
+from typing import Any, Callable
+
+from defame.common import logger, Model
+from defame.common.modeling import Completion
+from defame.common.prompt import Prompt
+
+# Arguments which only configure how the hosted model is loaded
+HOSTED_MODEL_KWARGS = ("prefix_cache_size", "cpu_inference", "quantize", "n_threads", "onnx_dir")
+
+class ModelServer:
+    """Starts and owns the model host process. Pass `connection_info` as `model_server`
+    inside the `llm_kwargs` of the fact-checkers (see make_model()) to let them use the
+    hosted model."""
+
+    def __init__(self,
+                 llm: str,
+                 llm_kwargs: dict = None,
+                 max_batch_size: int = 8,
+                 max_batch_delay: float = 0.05,
+                 startup_timeout: float = 3600):
+        """
+        @param llm: The model to host.
+        @param llm_kwargs: Passed to make_model() inside the host process.
+        @param max_batch_size: The maximum number of requests to process in one batch.
+        @param max_batch_delay: How long (in seconds) to wait for further requests
+            before processing an incomplete batch.
+        @param startup_timeout: Max. number of seconds to wait for the model to load.
+        """
+        self.llm = llm
+        self.authkey = os.urandom(32)
+
+        # Spawn (instead of fork) to not interfere with CUDA
+        ctx = multiprocessing.get_context("spawn")
+        conn_receive, conn_send = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(target=_serve,
+                                   kwargs=dict(llm=llm,
+                                               llm_kwargs=llm_kwargs or dict(),
+                                               authkey=self.authkey,
+                                               max_batch_size=max_batch_size,
+                                               max_batch_delay=max_batch_delay,
+                                               startup_connection=conn_send),
+                                   daemon=True)
+        self.process.start()
+        logger.info(f"Started model server for {llm} with PID {self.process.pid}. Loading the model...")
+
+        if not conn_receive.poll(startup_timeout):
+            self.stop()
+            raise TimeoutError(f"Model server did not start within {startup_timeout} seconds.")
+        try:
+            status, payload = conn_receive.recv()
+        except EOFError:
+            raise RuntimeError("Model server terminated unexpectedly during startup.")
+        if status == "error":
+            self.stop()
+            raise RuntimeError(f"Model server failed to start:\n{payload}")
+        self.address = payload
+        logger.info(f"Model server for {llm} is ready.")
+
+        atexit.register(self.stop)
+
+    @property
+    def connection_info(self) -> dict:
+        return dict(server_address=self.address, server_authkey=self.authkey)
+
+    def is_running(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=10)
+
+
+def _serve(llm: str,
+           llm_kwargs: dict,
+           authkey: bytes,
+           max_batch_size: int,
+           max_batch_delay: float,
+           startup_connection: Connection):
+    """Entry point of the model host process."""
+    try:
+        from defame.common.modeling import make_model
+        model = make_model(llm, **llm_kwargs)
+        listener = Listener(authkey=authkey)
+    except Exception:
+        startup_connection.send(("error", traceback.format_exc()))
+        return
+
+    host_class = _BatchJobHost if getattr(model, "batch_endpoint", None) is not None else _BatchingHost
+    host = host_class(model, max_batch_size=max_batch_size, max_batch_delay=max_batch_delay)
+    threading.Thread(target=host.accept_clients, args=(listener,), daemon=True).start()
+    startup_connection.send(("ready", listener.address))
+    host.run()
+
+
+class _BatchingHost:
+    """Collects the generation requests of all clients and processes them in batches."""
+
+    def __init__(self, model: Model, max_batch_size: int, max_batch_delay: float):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.requests = Queue()  # (client, request ID, request)
+
+    def accept_clients(self, listener: Listener):
+        while True:
+            connection = listener.accept()
+            client = _ClientConnection(connection)
+            client.send(dict(accepts_images=self.model.accepts_images,
+                             accepts_videos=self.model.accepts_videos,
+                             accepts_audio=self.model.accepts_audio,
+                             system_prompt=self.model.system_prompt))
+            threading.Thread(target=self.receive, args=(client,), daemon=True).start()
+
+    def receive(self, client: "_ClientConnection"):
+        """Receives the requests of one client. Cheap requests are answered right away,
+        generation requests are queued for batching."""
+        while True:
+            try:
+                request_id, request = client.connection.recv()
+            except (EOFError, OSError):
+                return  # Client disconnected
+
+            if request["type"] == "count_tokens":
+                # Safe while the batch is processed, the model doesn't share its counting tokenizer
+                try:
+                    client.send((request_id, self.model.count_tokens(request["text"]), None))
+                except Exception:
+                    client.send((request_id, None, traceback.format_exc()))
+            else:
+                self.requests.put((client, request_id, request))
+
+    def run(self):
+        while True:
+            batch = [self.requests.get()]
+
+            # Wait briefly for further requests to fill the batch
+            deadline = time.monotonic() + self.max_batch_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=timeout))
+                except Empty:
+                    break
+
+            self.process_batch(batch)
+
+    def process_batch(self, batch: list):
+        for params, items in _group_by_params(batch).items():
+            self.process_group(items, *params)
+
+    def process_group(self, items: list, temperature: float, top_p: float, top_k: int,
+                      system_prompt: str, batched: bool = True):
+        """Generates the responses to the requests sharing the given generation parameters
+        and sends them to the clients. Unless batched, the prompts are processed one by one."""
+        prompts = [Prompt(text=request["prompt"]) for _, _, request in items]
+        if not batched:
+            for item, prompt in zip(items, prompts):
+                self._respond([item], lambda: [self.model._generate(prompt, temperature=temperature, top_p=top_p,
+                                                                    top_k=top_k, system_prompt=system_prompt)])
+            return
+        self._respond(items, lambda: self.model._generate_batch(prompts, temperature=temperature, top_p=top_p,
+                                                                top_k=top_k, system_prompt=system_prompt))
+
+    @staticmethod
+    def _respond(items: list, generate: Callable[[], list[str]]):
+        try:
+            responses = generate()
+        except TimeoutError as e:
+            # Passed on as is, so that the clients don't retry (see Model.agenerate())
+            for client, request_id, _ in items:
+                client.send((request_id, None, e))
+        except Exception:
+            error = traceback.format_exc()
+            for client, request_id, _ in items:
+                client.send((request_id, None, error))
+        else:
+            for (client, request_id, _), response in zip(items, responses):
+                client.send((request_id, response, None))
+
+
+class _BatchJobHost(_BatchingHost):
+    """Host for models which submit their batches as batch jobs (see batch_api), each of
+    which takes minutes to hours. A client's single pending request belongs to a chain of
+    dependent calls, so it is answered right away through the real-time API. Only the
+    requests a client sends concurrently, like the summaries of a search's sources or the
+    answers to the questions about a claim, are independent. These are pooled across all
+    clients for `max_batch_delay` seconds and then submitted as one batch job."""
+
+    # Concurrent requests of one client arrive within this window
+    concurrency_window = 0.05
+
+    def __init__(self, model: Model, max_batch_size: int, max_batch_delay: float):
+        super().__init__(model, max_batch_size=max_batch_size, max_batch_delay=self.concurrency_window)
+        self.job_delay = max_batch_delay
+        self._job_items = []  # the independent requests collected for the next batch job
+        self._job_lock = threading.Lock()
+        threading.Thread(target=self.submit_jobs, daemon=True).start()
+
+    def process_batch(self, batch: list):
+        n_requests = Counter(client for client, _, _ in batch)
+        for item in batch:
+            client = item[0]
+            if n_requests[client] > 1:
+                with self._job_lock:
+                    self._job_items.append(item)
+            else:
+                threading.Thread(target=self.process_group, args=([item], *_get_params(item)),
+                                 kwargs=dict(batched=False), daemon=True).start()
+
+    def submit_jobs(self):
+        while True:
+            time.sleep(self.job_delay)
+            with self._job_lock:
+                items, self._job_items = self._job_items, []
+            for params, group in _group_by_params(items).items():
+                # Never submit a job for a single request
+                threading.Thread(target=self.process_group, args=(group, *params),
+                                 kwargs=dict(batched=len(group) > 1), daemon=True).start()
+
+
+def _get_params(item) -> tuple:
+    request = item[2]
+    return request["temperature"], request["top_p"], request["top_k"], request["system_prompt"]
+
+
+def _group_by_params(items: list) -> dict[tuple, list]:
+    """Only requests with identical generation parameters can share a batch."""
+    groups = dict()
+    for item in items:
+        groups.setdefault(_get_params(item), []).append(item)
+    return groups
+
+
+class _ClientConnection:
+    def __init__(self, connection: Connection):
+        self.connection = connection
+        self._lock = threading.Lock()
+
+    def send(self, message: Any):
+        with self._lock:
+            try:
+                self.connection.send(message)
+            except (EOFError, OSError):
+                pass  # Client disconnected, nobody is waiting for the response anymore
+
+
+class RemoteModel(Model):
+    """Stand-in for a model hosted by a ModelServer. Only the actual generation (and
+    tokenization) happens in the host process. Everything else, like fitting the prompt,
+    retrying, caching, and keeping the statistics, happens locally."""
+    open_source = True
+
+    def __init__(self, specifier: str, server_address, server_authkey: bytes, **kwargs):
+        self.server_address = server_address
+        self.server_authkey = server_authkey
+        for name in HOSTED_MODEL_KWARGS:
+            kwargs.pop(name, None)  # concern only the hosted model
+        super().__init__(specifier, **kwargs)
+
+    def load(self, model_name: str):
+        self._connection = Client(self.server_address, authkey=self.server_authkey)
+        capabilities = self._connection.recv()
+        self.accepts_images = capabilities["accepts_images"]
+        self.accepts_videos = capabilities["accepts_videos"]
+        self.accepts_audio = capabilities["accepts_audio"]
+        self.system_prompt = capabilities["system_prompt"]
+
+        self._send_lock = threading.Lock()
+        self._pending_lock = threading.Lock()  # guards _connected and _pending
+        self._connected = True
+        self._pending: dict[int, Future] = dict()
+        self._request_ids = itertools.count()
+        threading.Thread(target=self._receive_responses, daemon=True).start()
+        return self._request
+
+    def _request(self, request: dict) -> Future:
+        future = Future()
+        with self._pending_lock:
+            if not self._connected:
+                raise ConnectionError("Lost connection to the model server.")
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self._connection.send((request_id, request))
+        except (EOFError, OSError):
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise ConnectionError("Lost connection to the model server.")
+        return future
+
+    def _receive_responses(self):
+        while True:
+            try:
+                request_id, result, error = self._connection.recv()
+            except (EOFError, OSError):
+                with self._pending_lock:
+                    self._connected = False
+                    pending = list(self._pending.values())
+                    self._pending.clear()
+                for future in pending:
+                    future.set_exception(ConnectionError("Lost connection to the model server."))
+                return
+            with self._pending_lock:
+                future = self._pending.pop(request_id)
+            if error is None:
+                future.set_result(result)
+            elif isinstance(error, TimeoutError):
+                future.set_exception(error)
+            else:
+                future.set_exception(RuntimeError(f"Model server encountered an error:\n{error}"))
+
+    def _generate(self, prompt: Prompt, temperature: float, top_p: float, top_k: int,
+                  system_prompt: str = None) -> str:
+        return self._request(self._make_generation_request(prompt, temperature, top_p, top_k,
+                                                           system_prompt)).result()
+
+    async def _agenerate(self, prompt: Prompt, temperature: float, top_p: float, top_k: int,
+                         system_prompt: str = None) -> Completion:
+        future = self._request(self._make_generation_request(prompt, temperature, top_p, top_k, system_prompt))
+        return Completion(await asyncio.wrap_future(future))
+
+    def _make_generation_request(self, prompt: Prompt, temperature: float, top_p: float, top_k: int,
+                                 system_prompt: str = None) -> dict:
+        # Media are passed by reference, the host resolves them from the shared item store
+        return dict(type="generate",
+                    prompt=str(prompt),
+                    temperature=temperature,
+                    top_p=top_p,
+                    top_k=top_k,
+                    system_prompt=system_prompt)
+
+    def _count_text_tokens(self, text: str) -> int:
+        return self._request(dict(type="count_tokens", text=text)).result()
+
+    async def _acount_text_tokens(self, text: str) -> int:
+        return await asyncio.wrap_future(self._request(dict(type="count_tokens", text=text)))
@@ -1,11 +1,12 @@
 import atexit
+import threading
 import time
 import traceback
 from multiprocessing import Queue
+from multiprocessing.connection import wait
 from queue import Empty
 from threading import Thread
-
-import torch
+from typing import Callable
 
 from defame.common import logger
 from defame.helpers.common import Status
@@ -36,6 +37,11 @@ class Pool:
         self.n_tasks_received = 0
 
         self.workers: list[FactCheckerWorker] = []
+        self._workers_started = threading.Event()
+
+        # Functions called (from the pool's thread) whenever the state of a task changed
+        self._update_listeners: list[Callable[[], None]] = []
+        self._listeners_lock = threading.Lock()
 
         Thread(target=self.run, daemon=True).start()
 
@@ -46,18 +52,20 @@ class Pool:
     def run(self):
         """Runs in an own thread, supervises workers, processes their messages, and reports logs."""
         self._run_workers()
-        self.wait_until_ready()
+        self._workers_started.set()
         while self.is_running() and not self.terminating:
             try:
+                self._wait_for_messages()
                 self.process_messages()
                 self.report_errors()
-                time.sleep(0.1)
             except Exception:
                 logger.error("Error encountered in worker pool main thread:")
                 logger.error(traceback.format_exc())
 
     def _get_default_device_assignments(self):
         """Distributes workers evenly across available CUDA devices."""
+        import torch
+
         n_devices = torch.cuda.device_count()
         if n_devices == 0:
             return [None] * self.n_workers
@@ -77,6 +85,28 @@ class Pool:
             self.workers.append(worker)
             logger.debug(f"Started worker {i} with PID {worker.pid}.")
 
+    def _wait_for_messages(self):
+        """Blocks until any worker sends a message or terminates."""
+        handles = [handle for worker in self.workers if worker.is_alive() for handle in worker.wait_handles]
+        if handles:
+            wait(handles)
+
+    def add_update_listener(self, listener: Callable[[], None]):
+        """Registers a function to be called whenever the state of any task changed.
+        The listener is called from the pool's thread and must return quickly."""
+        with self._listeners_lock:
+            self._update_listeners.append(listener)
+
+    def remove_update_listener(self, listener: Callable[[], None]):
+        with self._listeners_lock:
+            self._update_listeners.remove(listener)
+
+    def _notify_update_listeners(self):
+        with self._listeners_lock:
+            listeners = list(self._update_listeners)
+        for listener in listeners:
+            listener()
+
     def get_worker(self, worker_id: int) -> FactCheckerWorker:
         return self.workers[worker_id]
 
@@ -84,6 +114,7 @@ class Pool:
         self._scheduled_tasks.put(task)
         self.tasks[task.id] = task
         self.n_tasks_received += 1
+        self._notify_update_listeners()
 
     def get_result(self, timeout=None):
         if not self.is_running():
@@ -118,14 +149,33 @@ class Pool:
                         task = self.tasks[task_id]
                         task.assign_worker(self.workers[worker_id])
                         task.update(msg)
+                        self._notify_update_listeners()
 
     def report_errors(self):
         # Forward error logs
         for error in self.errors():
             logger.error(error)
 
-    def stop(self):
+    def stop(self, timeout: float = 120):
+        """Lets the workers finish their current task and pending report exports,
+        dropping all tasks not started yet. Terminates the workers still running
+        after `timeout` seconds."""
+        if self.terminating:
+            return
         self.terminating = True
+
+        # Drop the scheduled tasks and signal the workers to stop via one None each
+        try:
+            while True:
+                self._scheduled_tasks.get_nowait()
+        except Empty:
+            pass
+        for _ in self.workers:
+            self._scheduled_tasks.put(None)
+
+        deadline = time.time() + timeout
+        for worker in self.workers:
+            worker.join(timeout=max(0., deadline - time.time()))
         self.terminate_all_workers()
 
     def terminate_all_workers(self):
@@ -147,6 +197,5 @@ class Pool:
                 all(worker.is_alive() for worker in self.workers))
 
     def wait_until_ready(self):
-        """Sleeps until all workers are alive."""
-        while not self.is_ready():
-            time.sleep(0.1)
+        """Blocks until all workers are started."""
+        self._workers_started.wait()
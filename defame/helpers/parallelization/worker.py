@@ -1,13 +1,10 @@
 import traceback
 from multiprocessing import Queue, Pipe, Process
-from queue import Empty
 from multiprocessing.connection import Connection
 from pathlib import Path
-from time import sleep
 from typing import Callable
 
 from defame.common import logger, Content, Claim
-from defame.fact_checker import FactChecker
 from defame.helpers.common import Status
 
 
@@ -25,6 +22,12 @@ class Worker(Process):
 
         self.start()
 
+    @property
+    def wait_handles(self) -> list:
+        """The objects that become ready (see multiprocessing.connection.wait()) when
+        this worker sends a message or terminates."""
+        return [self._connection, self.sentinel]
+
     def task_updates(self) -> dict:
         while self._connection.poll():
             yield self._connection.recv()
@@ -90,7 +93,9 @@ class Runner:
             logger.set_log_level(print_log_level)
             logger.set_connection(connection)
 
-            # Initialize the fact-checker
+            # Initialize the fact-checker (imported only here, in the worker process, to
+            # keep the pool's host process, like the API frontend, lightweight)
+            from defame.fact_checker import FactChecker
             fc = FactChecker(device=device, **kwargs)
 
         except Exception:
@@ -101,12 +106,10 @@ class Runner:
 
         # Complete tasks forever
         while self.running:
-            # Fetch the next task and report it
-            try:
-                task = input_queue.get(block=False)
-            except Empty:
-                sleep(0.1)
-                continue
+            # Wait for the next task and report it
+            task = input_queue.get()
+            if task is None:  # the pool shuts down
+                break
 
             try:
                 report("Starting task.", status=Status.RUNNING)
@@ -129,7 +132,7 @@ class Runner:
                     # Task is claim verification
                     report("Verifying claim.")
                     doc, meta = fc.verify_claim(payload)
-                    doc.save_to(logger.target_dir)
+                    fc.report_exporter.export(doc, logger.target_dir)
                     output_queue.put((doc, meta))
                     report("Claim verification completed successfully.",
                            status=Status.DONE,
@@ -142,5 +145,8 @@ class Runner:
                 error_message = f"Worker {self.worker_id} encountered an error while processing task {task.id}:\n"
                 error_message += traceback.format_exc()
                 report(error_message, status=Status.FAILED)
+
+        # Finish the PDF reports still rendering in the background
+        fc.report_exporter.wait()
         # logger.info(f"Runner of worker {self.worker_id} terminated.")
         # quit(0)
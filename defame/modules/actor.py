@@ -1,27 +1,47 @@
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
-from defame.common import Action, Report, Evidence
+from defame.common import Action, Report, Evidence, logger
+from defame.common.results import ErrorResults
+from defame.evidence_retrieval.evidence_pool import EvidencePool
 from defame.evidence_retrieval.tools import Tool, Searcher
 
 
 class Actor:
     """Agent that executes given Actions and returns the resulted Evidence."""
 
-    def __init__(self, tools: list[Tool]):
+    def __init__(self, tools: list[Tool], max_parallel_actions: int = 8):
+        """
+        @param max_parallel_actions: The max. number of actions executed at the same time.
+            The number of parallel actions per tool is further limited by the tool's
+            `max_parallelism`.
+        """
         self.tools = tools
+        self.max_parallel_actions = max_parallel_actions
 
     def perform(self, actions: list[Action], doc: Report = None, summarize: bool = True) -> list[Evidence]:
-        # TODO: Parallelize
-        all_evidence = []
+        """Executes the actions concurrently and returns the evidence in the order of
+        the actions. A failing action yields evidence without takeaways."""
         for action in actions:
             assert isinstance(action, Action)
-            all_evidence.append(self._perform_single(action, doc, summarize=summarize))
-        return all_evidence
+
+        if len(actions) <= 1 or self.max_parallel_actions <= 1:
+            return [self._perform_single(action, doc, summarize=summarize) for action in actions]
+
+        n_threads = min(self.max_parallel_actions, len(actions))
+        with ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="action") as executor:
+            return list(executor.map(lambda a: self._perform_single(a, doc, summarize=summarize), actions))
 
     def _perform_single(self, action: Action, doc: Report = None, summarize: bool = True) -> Evidence:
         tool = self.get_corresponding_tool_for_action(action)
-        return tool.perform(action, summarize=summarize, doc=doc)
+        try:
+            with tool.parallelism_limit:
+                return tool.perform(action, summarize=summarize, doc=doc)
+        except Exception as e:
+            logger.error(f"Tool {tool.name} failed to perform {action}:\n{traceback.format_exc()}")
+            return Evidence(ErrorResults(repr(e)), action, takeaways=None)
 
     def get_corresponding_tool_for_action(self, action: Action) -> Tool:
         for tool in self.tools:
@@ -34,6 +54,17 @@ class Actor:
         for tool in self.tools:
             tool.reset()
 
+    def fork(self) -> "Actor":
+        """Returns an actor with forked tools, i.e., with separate state (like the known
+        sources) and stats. The forked tools keep the current claim ID and date restriction."""
+        return Actor(tools=[tool.fork() for tool in self.tools],
+                     max_parallel_actions=self.max_parallel_actions)
+
+    def merge_stats(self, other: "Actor"):
+        """Adds the tool stats of `other`, a fork of this actor, to this actor's tool stats."""
+        for tool, other_tool in zip(self.tools, other.tools):
+            tool.merge_stats(other_tool)
+
     def set_current_claim_id(self, claim_id: str):
         for tool in self.tools:
             tool.set_claim_id(claim_id)
@@ -50,3 +81,10 @@ class Actor:
         searcher = self._get_searcher()
         if searcher is not None:
             searcher.set_time_restriction(before)
+
+    def set_evidence_pool(self, evidence_pool: Optional[EvidencePool]):
+        """Lets the searcher share scraped contents via the given pool
+        (or stop sharing if None). Forks of this actor use the same pool."""
+        searcher = self._get_searcher()
+        if searcher is not None:
+            searcher.evidence_pool = evidence_pool
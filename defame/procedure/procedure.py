@@ -1,7 +1,8 @@
 from abc import ABC
-from typing import Any
+from typing import Any, Optional
 
 from defame.common import Report, Label, Model
+from defame.common.checkpoint import Checkpoint
 from defame.evidence_retrieval import Source, Search
 from defame.evidence_retrieval.integrations import SearchResults
 from defame.modules import Judge, Actor, Planner
@@ -17,6 +18,7 @@ class Procedure(ABC):
         self.judge = judge
         self.planner = planner
         self.max_attempts = max_attempts
+        self.checkpoint: Optional[Checkpoint] = None  # set by the FactChecker if checkpointing is enabled
 
     def apply_to(self, doc: Report) -> (Label, dict[str, Any]):
         """Receives a fact-checking document (including a claim) and performs a fact-check on the claim.
@@ -24,18 +26,34 @@ class Procedure(ABC):
         specific meta information."""
         raise NotImplementedError
 
+    def _get_checkpoint_state(self) -> dict:
+        """Returns the procedure's state saved with the last checkpoint (if resuming an
+        interrupted fact-check) or an empty dict."""
+        if self.checkpoint is None:
+            return dict()
+        return self.checkpoint.state.get("procedure", dict())
+
+    def _save_checkpoint(self, doc: Report, **state):
+        """Saves the Report and the procedure's state after a completed stage."""
+        if self.checkpoint is not None:
+            self.checkpoint.save(doc, procedure=state, judge_reasoning=self.judge.get_latest_reasoning())
+
     def retrieve_sources(
             self,
             search_actions: list[Search],
             doc: Report = None,
-            summarize: bool = False
+            summarize: bool = False,
+            actor: Actor = None
     ) -> list[Source]:
-        evidence = self.actor.perform(search_actions, doc=doc, summarize=summarize)
+        """Runs the search actions with `actor` (defaults to the procedure's actor) and
+        returns all retrieved sources."""
+        actor = actor or self.actor
+        evidence = actor.perform(search_actions, doc=doc, summarize=summarize)
         sources = []
         for e in evidence:
             results = e.raw
             if isinstance(results, SearchResults):
-                sources.extend(results.sources)Add commentMore actions
+                sources.extend(results.sources)
         return sources
 
     def _develop(self, doc: Report):
@@ -1,17 +1,34 @@
+import asyncio
 from abc import ABC
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from defame.common import Report, logger
 from defame.evidence_retrieval.tools import Search
 from defame.evidence_retrieval.integrations.search.common import WebSource
+from defame.modules import Actor
 from defame.procedure.procedure import Procedure
 from defame.prompts.prompts import PoseQuestionsPrompt, ProposeQueries, AnswerQuestion
+from defame.utils.aio import run_sync
 from defame.utils.console import light_blue
 
 
 class QABased(Procedure, ABC):
     """Base class for all procedures that apply a questions & answers (Q&A) strategy."""
 
+    def __init__(self, max_parallel_questions: int = 4, n_speculative_answers: int = 1, **kwargs):
+        """
+        @param max_parallel_questions: The max. number of questions answered concurrently.
+            Each question gets its own fork of the actor, i.e., separate known sources.
+        @param n_speculative_answers: The number of search results from which an answer
+            to a question is attempted concurrently. If 1, the results are tried one
+            after another. Higher values reduce latency at the cost of more LLM calls.
+        """
+        super().__init__(**kwargs)
+        self.max_parallel_questions = max_parallel_questions
+        self.n_speculative_answers = n_speculative_answers
+
     def _pose_questions(self, no_of_questions: int, doc: Report) -> list[str]:
         """Generates some questions that needs to be answered during the fact-check."""
         prompt = PoseQuestionsPrompt(doc, n_questions=no_of_questions)
@@ -23,12 +40,12 @@ class QABased(Procedure, ABC):
 
     def approach_question_batch(self, questions: list[str], doc: Report) -> list:
         """Tries to answer the given list of questions. Unanswerable questions are dropped."""
-        # Answer each question, one after another
-        q_and_a = []
-        for question in questions:
-            qa_instance = self.approach_question(question, doc)
-            if qa_instance is not None:
-                q_and_a.append(qa_instance)
+        if len(questions) <= 1 or self.max_parallel_questions <= 1:
+            # Answer each question, one after another
+            qa_instances = [self.approach_question(question, doc) for question in questions]
+        else:
+            qa_instances = self._approach_questions_concurrently(questions, doc)
+        q_and_a = [qa_instance for qa_instance in qa_instances if qa_instance is not None]
 
         # Add Q&A to doc reasoning
         q_and_a_strings = [(f"### {triplet['question']}\n"
@@ -39,6 +56,19 @@ class QABased(Procedure, ABC):
 
         return q_and_a
 
+    def _approach_questions_concurrently(self, questions: list[str], doc: Report) -> list[Optional[dict]]:
+        """Answers the questions in parallel, each with its own fork of the actor. Returns
+        the results in the order of the questions. Afterward, the forks' tool stats get
+        added to the actor's stats."""
+        actors = [self.actor.fork() for _ in questions]
+        n_threads = min(self.max_parallel_questions, len(questions))
+        with ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="question") as executor:
+            qa_instances = list(executor.map(lambda q, a: self.approach_question(q, doc, actor=a),
+                                             questions, actors))
+        for actor in actors:
+            self.actor.merge_stats(actor)
+        return qa_instances
+
     def propose_queries_for_question(self, question: str, doc: Report) -> list[Search]:
         prompt = ProposeQueries(question, doc)
 
@@ -60,10 +90,12 @@ class QABased(Procedure, ABC):
         logger.warning("Got no search query, dropping this question.")
         return []
 
-    def approach_question(self, question: str, doc: Report = None) -> Optional[dict]:
-        """Tries to answer the given question. If unanswerable, returns None."""
+    def approach_question(self, question: str, doc: Report = None, actor: Actor = None) -> Optional[dict]:
+        """Tries to answer the given question. If unanswerable, returns None. Searches
+        with `actor` which defaults to the procedure's actor."""
         logger.log(light_blue(f"Answering question: {question}"))
-        self.actor.reset()
+        actor = actor or self.actor
+        actor.reset()
 
         # Stage 3: Generate search queries
         queries = self.propose_queries_for_question(question, doc)
@@ -71,7 +103,7 @@ class QABased(Procedure, ABC):
             return None
 
         # Execute searches and gather all results
-        search_results = self.retrieve_sources(queries)
+        search_results = self.retrieve_sources(queries, actor=actor)
 
         # Step 4: Answer generation
         if len(search_results) > 0:
@@ -106,15 +138,57 @@ class QABased(Procedure, ABC):
     ) -> (Optional[str], Optional[WebSource]):
         """Generates an answer to the given question by iterating over the search results
         and using them individually to answer the question."""
+        if self.n_speculative_answers > 1 and len(results) > 1:
+            return run_sync(self._answer_question_speculatively(question, results, doc))
+
         for result in results:
             answer = self.attempt_answer_question(question, result, doc)
             if answer is not None:
                 return answer, result
         return None, None
 
+    async def _answer_question_speculatively(
+            self,
+            question: str,
+            results: list[WebSource],
+            doc: Report
+    ) -> (Optional[str], Optional[WebSource]):
+        """Like answer_question_individually() but keeps up to `n_speculative_answers`
+        answer attempts running at the same time. Returns the answer from the highest-ranked
+        result that answers the question and cancels the attempts of lower-ranked results."""
+        remaining = iter(results)
+        pending = deque()
+
+        def launch_next():
+            result = next(remaining, None)
+            if result is not None:
+                pending.append((result, asyncio.ensure_future(self.aattempt_answer_question(question, result, doc))))
+
+        for _ in range(self.n_speculative_answers):
+            launch_next()
+
+        try:
+            while pending:
+                result, attempt = pending.popleft()
+                answer = await attempt
+                if answer is not None:
+                    return answer, result
+                launch_next()
+            return None, None
+        finally:
+            for _, attempt in pending:
+                attempt.cancel()
+
     def attempt_answer_question(self, question: str, result: WebSource, doc: Report) -> Optional[str]:
         """Generates an answer to the given question."""
         prompt = AnswerQuestion(question, result, doc)
         out = self.llm.generate(prompt, max_attempts=3)
         if out is not None and out["answered"]:
             return out["answer"]
+
+    async def aattempt_answer_question(self, question: str, result: WebSource, doc: Report) -> Optional[str]:
+        """Async version of attempt_answer_question()."""
+        prompt = AnswerQuestion(question, result, doc)
+        out = await self.llm.agenerate(prompt, max_attempts=3)
+        if out is not None and out["answered"]:
+            return out["answer"]
@@ -9,11 +9,20 @@ class InFact(QABased):
     generation, follows outside of this method)."""
 
     def apply_to(self, doc: Report) -> (Label, dict[str, Any]):
+        # Resume from the last checkpoint, if any
+        state = self._get_checkpoint_state()
+
         # Stage 1 & 2: Interpretation & Question posing
-        questions = self._pose_questions(no_of_questions=10, doc=doc)
+        questions = state.get("questions")
+        if questions is None:
+            questions = self._pose_questions(no_of_questions=10, doc=doc)
+            self._save_checkpoint(doc, questions=questions)
 
         # Stages 3 & 4: Search query generation and question answering
-        q_and_a = self.approach_question_batch(questions, doc)
+        q_and_a = state.get("q_and_a")
+        if q_and_a is None:
+            q_and_a = self.approach_question_batch(questions, doc)
+            self._save_checkpoint(doc, questions=questions, q_and_a=q_and_a)
 
         # Stage 5: Veracity prediction
         label = self.judge.judge(doc)
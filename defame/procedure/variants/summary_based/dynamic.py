@@ -10,28 +10,48 @@ class DynamicSummary(Procedure):
         self.max_iterations = max_iterations
 
     def apply_to(self, doc: Report) -> (Label, dict[str, Any]):
-        n_iterations = 0
-        label = Label.NEI
-        empty_action_count = 0 # winnie
-        while label == Label.NEI and n_iterations < self.max_iterations:
-            if n_iterations > 0:
-                logger.log("Not enough information yet. Continuing fact-check...")
-            n_iterations += 1
-            actions, reasoning = self.planner.plan_next_actions(doc)
-            #winnie
-            if not actions:
-                empty_action_count += 1
-                if empty_action_count >= 2:  # Exit after 2 failed attempts
-                    logger.log("No new actions available. Ending fact-check.")
-                    break
-            else:
-                empty_action_count = 0 #winnie
-            if len(reasoning) > 32:  # Only keep substantial reasoning
-                doc.add_reasoning(reasoning)
-            if actions:
-                doc.add_actions(actions)
+        # Resume from the last checkpoint, if any
+        state = self._get_checkpoint_state()
+        n_iterations = state.get("n_iterations", 0)
+        label = state.get("label", Label.NEI)
+        empty_action_count = state.get("empty_action_count", 0) # winnie
+        actions = state.get("actions")
+        stage = state.get("stage", "judge")  # the last completed stage
+
+        def save_checkpoint():
+            self._save_checkpoint(doc, n_iterations=n_iterations, label=label,
+                                  empty_action_count=empty_action_count, actions=actions, stage=stage)
+
+        while stage != "judge" or (label == Label.NEI and n_iterations < self.max_iterations):
+            if stage == "judge":
+                if n_iterations > 0:
+                    logger.log("Not enough information yet. Continuing fact-check...")
+                n_iterations += 1
+                actions, reasoning = self.planner.plan_next_actions(doc)
+                #winnie
+                if not actions:
+                    empty_action_count += 1
+                    if empty_action_count >= 2:  # Exit after 2 failed attempts
+                        logger.log("No new actions available. Ending fact-check.")
+                        break
+                else:
+                    empty_action_count = 0 #winnie
+                if len(reasoning) > 32:  # Only keep substantial reasoning
+                    doc.add_reasoning(reasoning)
+                if actions:
+                    doc.add_actions(actions)
+                stage = "plan"
+                save_checkpoint()
+            if actions and stage == "plan":
                 evidences = self.actor.perform(actions, doc)
                 doc.add_evidence(evidences)  # even if no evidence, add empty evidence block for the record
+                stage = "act"
+                save_checkpoint()
+            if actions and stage == "act":
                 self._develop(doc)
+                stage = "develop"
+                save_checkpoint()
             label = self.judge.judge(doc, is_final=n_iterations == self.max_iterations or not actions)
+            stage = "judge"
+            save_checkpoint()
         return label, {}
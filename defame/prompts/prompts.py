@@ -16,6 +16,9 @@ from defame.utils.parsing import (remove_non_symbols, extract_last_code_span, re
 SYMBOL = 'Check-worthy'
 NOT_SYMBOL = 'Unimportant'
 
+# Token budget for the Report in prompts where it only serves as background information
+CONTEXT_DOC_TOKEN_BUDGET = 4096
+
 def get_action_registry():
     """Lazy import to avoid circular dependencies"""
     from defame.evidence_retrieval.tools import ACTION_REGISTRY
@@ -41,7 +44,7 @@ class JudgePrompt(Prompt):
         class_str = '\n'.join([f"* `{cls.value}`: {remove_non_symbols(class_definitions[cls])}"
                                for cls in classes])
         placeholder_targets = {
-            "[DOC]": str(doc),
+            "[DOC]": doc,
             "[CLASSES]": class_str,
             "[EXTRA_RULES]": "" if extra_rules is None else remove_non_symbols(extra_rules),
         }
@@ -84,11 +87,12 @@ class FilterCheckWorthyPrompt(Prompt):
 
 class SummarizeSourcePrompt(Prompt):
     template_file_path = "defame/prompts/summarize_source.md"
+    doc_token_budget = CONTEXT_DOC_TOKEN_BUDGET
 
     def __init__(self, source: Source, doc: Report):
         placeholder_targets = {
             "[SOURCE]": str(source),
-            "[DOC]": str(doc),
+            "[DOC]": doc,
         }
         super().__init__(placeholder_targets=placeholder_targets)
 
@@ -246,6 +250,7 @@ class ProposeQueriesNoQuestions(Prompt):
 class AnswerCollectively(Prompt):
     """Used to generate answers to the AVeriTeC questions."""
     template_file_path = "defame/prompts/answer_question_collectively.md"
+    doc_token_budget = CONTEXT_DOC_TOKEN_BUDGET
 
     def __init__(self, question: str, results: list[Source], doc: Report):
         result_strings = [f"## Result `{i}`\n{str(result)}" for i, result in enumerate(results)]
@@ -283,6 +288,7 @@ class AnswerCollectively(Prompt):
 class AnswerQuestion(Prompt):
     """Used to generate answers to the AVeriTeC questions."""
     template_file_path = "defame/prompts/answer_question.md"
+    doc_token_budget = CONTEXT_DOC_TOKEN_BUDGET
 
     def __init__(self, question: str, result: Source, doc: Report):
         placeholder_targets = {
@@ -0,0 +1,27 @@
+from defame.common.batch_api import LocalBatchEndpoint, run_batch
+
+
+def make_body(text: str) -> dict:
+    return dict(model="gpt-4o-mini", messages=[dict(role="user", content=[dict(type="text", text=text)])])
+
+
+def test_local_batch(tmp_path):
+    endpoint = LocalBatchEndpoint(processing_delay=0.2)
+    bodies = [make_body(f"Question {i}") for i in range(5)]
+    responses = run_batch(endpoint, bodies, poll_interval=0.1, batch_dir=tmp_path)
+    texts = [response["choices"][0]["message"]["content"] for response in responses]
+    assert texts == [f"Question {i}" for i in range(5)]
+    assert len(list(tmp_path.glob("*_requests.jsonl"))) == 1
+    assert len(list(tmp_path.glob("*_results.jsonl"))) == 1
+
+
+def test_failed_requests(tmp_path):
+    def respond(body: dict) -> str:
+        if "fail" in body["messages"][-1]["content"][0]["text"]:
+            raise RuntimeError("Request failed.")
+        return "OK"
+
+    endpoint = LocalBatchEndpoint(respond=respond)
+    responses = run_batch(endpoint, [make_body("fail"), make_body("succeed")], poll_interval=0.1, batch_dir=tmp_path)
+    assert responses[0] is None
+    assert responses[1]["choices"][0]["message"]["content"] == "OK"
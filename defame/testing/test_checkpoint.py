@@ -0,0 +1,24 @@
+from defame.common import Claim, Report
+from defame.common.checkpoint import Checkpoint
+
+
+def test_save_and_resume(tmp_path):
+    claim = Claim("The sky is blue.")
+    checkpoint = Checkpoint(tmp_path / "checkpoint.pkl", claim)
+    assert checkpoint.load() is None
+
+    doc = Report(claim)
+    doc.add_reasoning("Planned a search.")
+    checkpoint.save(doc, procedure=dict(stage="plan", n_iterations=1))
+
+    # A new process resumes from the checkpoint
+    resumed = Checkpoint(tmp_path / "checkpoint.pkl", claim)
+    resumed_doc = resumed.load()
+    assert resumed_doc.get_all_reasoning() == ["Planned a search."]
+    assert resumed.state["procedure"] == dict(stage="plan", n_iterations=1)
+
+    # Checkpoints of other claims are ignored
+    assert Checkpoint(tmp_path / "checkpoint.pkl", Claim("The sky is green.")).load() is None
+
+    resumed.clear()
+    assert not (tmp_path / "checkpoint.pkl").exists()
@@ -0,0 +1,8 @@
+from defame.common.modeling import make_model
+
+
+def test_cpu_inference():
+    llm = make_model("tinyllama", cpu_inference=True, max_response_len=16)
+    response = llm.generate("Name the capital of France.")
+    assert isinstance(response, str) and len(response) > 0
+    assert llm.get_stats()["Output tokens"] > 0
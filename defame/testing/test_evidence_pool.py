@@ -0,0 +1,16 @@
+from ezmm import MultimodalSequence
+
+from defame.evidence_retrieval.evidence_pool import EvidencePool
+
+
+def test_evidence_pool():
+    pool = EvidencePool()
+    url = "https://example.com/article"
+    assert pool.get_content(url) is None
+
+    pool.add_content(url, None)  # failed scrape
+    assert pool.get_content(url) is None
+    pool.add_content(url, MultimodalSequence("Some article."))
+    assert str(pool.get_content(url)) == "Some article."
+    assert pool.n_reused_contents == 1
+
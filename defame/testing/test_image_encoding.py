@@ -0,0 +1,17 @@
+from defame.common.image_encoding import count_tiles, fit_to_tile_grid, get_billed_size
+
+
+def test_billed_size():
+    assert get_billed_size(4000, 3000) == (1024, 768)
+    assert get_billed_size(300, 200) == (300, 200)
+
+
+def test_fit_to_tile_grid():
+    # Slightly overlapping tile boundaries get shrunk to the boundary
+    assert count_tiles(530, 400) == 2
+    assert fit_to_tile_grid(530, 400) == (512, 386)
+    assert count_tiles(*fit_to_tile_grid(1100, 700)) == 4
+
+    # Small images and those requiring too much shrinking remain as they are
+    assert fit_to_tile_grid(300, 200) == (300, 200)
+    assert fit_to_tile_grid(1600, 900) == get_billed_size(1600, 900)
@@ -0,0 +1,24 @@
+from defame.common.prompt_stats import Histogram, PromptStats
+from defame.utils.utils import flatten_dict
+
+
+def test_histogram():
+    histogram = Histogram([1, 5], unit="s")
+    for value in [0.2, 1, 3, 10, 20]:
+        histogram.add(value)
+    assert histogram.to_dict() == {"<=1s": 2, "<=5s": 1, ">5s": 2}
+
+
+def test_prompt_stats():
+    stats = PromptStats()
+    stats.add("JudgePrompt", latency=2.5, n_input_tokens=3000, n_output_tokens=100,
+              n_attempts=2, n_extraction_failures=1, failed=False)
+    stats.add("JudgePrompt", latency=0.3, n_input_tokens=2000, n_output_tokens=50,
+              n_attempts=1, n_extraction_failures=0, failed=False)
+    judge_stats = stats.to_dict()["JudgePrompt"]
+    assert judge_stats["Calls"] == 2
+    assert judge_stats["Extraction failures"] == 1
+    assert judge_stats["Attempts histogram"] == {"<=1": 1, "<=2": 1, "<=3": 0, "<=5": 0, ">5": 0}
+
+    # The stats must be flattenable into the columns of instance_stats.csv
+    assert flatten_dict(dict(Prompts=stats.to_dict()))["Prompts/JudgePrompt/Latency histogram/<=5s"] == 1
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from defame.common.rate_limiter import RateLimiter
+
+
+def test_requests_per_minute(tmp_path):
+    limiter = RateLimiter("gpt_4o_mini", rpm_limit=60, db_path=tmp_path / "limits.db")
+
+    async def acquire_n_times(n: int):
+        for _ in range(n):
+            await limiter.acquire()
+
+    start = time.time()
+    asyncio.run(acquire_n_times(62))  # the bucket holds 60 requests, then refills at 1 request/s
+    assert 1.5 < time.time() - start < 5
+
+
+def test_budget_is_shared(tmp_path):
+    limiter = RateLimiter("gpt_4o_mini", tpm_limit=600, db_path=tmp_path / "limits.db")
+    other_limiter = RateLimiter("gpt_4o_mini", tpm_limit=600, db_path=tmp_path / "limits.db")
+    asyncio.run(limiter.acquire(600))
+    other_limiter.consume(10)  # the bucket refills at 10 tokens/s
+
+    start = time.time()
+    asyncio.run(other_limiter.acquire(10))
+    assert 1.5 < time.time() - start < 5
+
+
+def test_unlimited_requests_are_not_charged(tmp_path):
+    limiter = RateLimiter("gpt_4o_mini", tpm_limit=600, db_path=tmp_path / "limits.db")
+    for _ in range(10):
+        asyncio.run(limiter.acquire(10))
+
+    # Otherwise, a limiter with an RPM limit sharing the budgets would wait for these requests
+    requests = limiter._conn.execute("SELECT requests FROM buckets").fetchone()[0]
+    assert requests == 0
+
+
+def test_backoff_blocks_all_callers(tmp_path):
+    limiter = RateLimiter("gpt_4o_mini", db_path=tmp_path / "limits.db")
+    other_limiter = RateLimiter("gpt_4o_mini", db_path=tmp_path / "limits.db")
+
+    async def hit_rate_limit_and_acquire():
+        backoff = asyncio.create_task(limiter.backoff(attempt=0, retry_after=1))
+        await asyncio.sleep(0.1)
+        start = time.time()
+        await other_limiter.acquire()
+        await backoff
+        return time.time() - start
+
+    assert 0.5 < asyncio.run(hit_rate_limit_and_acquire()) < 3
@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+
+from defame.utils.rendering import CachedStr
+
+
+@dataclass
+class Block(CachedStr):
+    lines: list[str]
+    title: str = "Block"
+
+    n_renders = 0
+
+    def _render(self) -> str:
+        Block.n_renders += 1
+        return f"## {self.title}\n" + "\n".join(self.lines)
+
+
+def test_cached_str():
+    Block.n_renders = 0
+    block = Block(["a", "b"])
+    assert str(block) == "## Block\na\nb"
+    assert str(block) == "## Block\na\nb"
+    assert Block.n_renders == 1
+
+    block.title = "Evidence"
+    assert str(block) == "## Evidence\na\nb"
+    assert Block.n_renders == 2
+
+    block.lines.append("c")
+    block.invalidate()
+    assert str(block) == "## Evidence\na\nb\nc"
+    assert Block.n_renders == 3
+
+    assert block == Block(["a", "b", "c"], title="Evidence")
@@ -0,0 +1,39 @@
+from defame.common import Prompt
+from defame.common.response_cache import ResponseCache
+
+
+def make_key(cache: ResponseCache, text: str, temperature: float = 0.01) -> str:
+    return cache.make_key("gpt_4o_mini", "You are a fact-checker.", Prompt(text=text),
+                          temperature=temperature, top_p=0.9, top_k=50, max_response_len=2048)
+
+
+def test_get_and_put(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db")
+    key = make_key(cache, "Is the sky blue?")
+    assert cache.get(key) is None
+    cache.put(key, "Yes.")
+    assert cache.get(key) == "Yes."
+
+    # The cache is persistent and can be shared
+    other_cache = ResponseCache(tmp_path / "cache.db")
+    assert other_cache.get(key) == "Yes."
+
+
+def test_key_depends_on_request(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db")
+    key = make_key(cache, "Is the sky blue?")
+    assert key == make_key(cache, "Is the sky blue?")
+    assert key != make_key(cache, "Is the sky green?")
+    assert key != make_key(cache, "Is the sky blue?", temperature=0.5)
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db", max_size=10)
+    key_a, key_b, key_c = [make_key(cache, text) for text in ["A", "B", "C"]]
+    cache.put(key_a, "aaaa")
+    cache.put(key_b, "bbbb")
+    cache.get(key_a)  # makes B the least-recently used entry
+    cache.put(key_c, "cccc")
+    assert cache.get(key_b) is None
+    assert cache.get(key_a) == "aaaa"
+    assert cache.get(key_c) == "cccc"
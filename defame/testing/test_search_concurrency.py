@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from defame.common.results import ErrorResults
+from defame.evidence_retrieval.integrations.search import PLATFORMS
+from defame.evidence_retrieval.integrations.search.semantic_search_db import SemanticSearchDB
+from defame.evidence_retrieval.tools import Searcher
+from defame.evidence_retrieval.tools.searcher import Search
+from defame.modules.actor import Actor
+
+N_ARTICLES = 4
+
+
+class ToyDB(SemanticSearchDB):
+    """Semantic search DB over a few articles which returns all of them for any query."""
+    name = "toy_db"
+    description = "A toy database for testing."
+
+    def __init__(self, db_file_path: str, max_search_results: int = None):
+        super().__init__(db_file_path)
+        self.threads = set()
+
+    def _embed(self, *args, **kwargs):
+        return np.zeros(8)
+
+    def _search_semantically(self, query_embedding, limit: int) -> list[int]:
+        return list(range(min(limit, N_ARTICLES)))
+
+    def retrieve(self, idx: int):
+        self.threads.add(threading.current_thread().name)
+        url, text = self._run_sql_query("SELECT url, text FROM articles WHERE ROWID = ?", idx + 1)[0]
+        return url, text, None
+
+
+def make_searcher(tmp_path, monkeypatch) -> Searcher:
+    db_file_path = tmp_path / "toy.db"
+    with sqlite3.connect(db_file_path) as db:
+        db.execute("CREATE TABLE articles(url TEXT, text TEXT)")
+        db.executemany("INSERT INTO articles VALUES (?, ?)",
+                       [(f"https://example.com/{i}", f"Article {i}.") for i in range(N_ARTICLES)])
+    monkeypatch.setitem(PLATFORMS, ToyDB.name, ToyDB)
+    return Searcher(search_config={ToyDB.name: {"db_file_path": str(db_file_path)}},
+                    limit_per_search=N_ARTICLES)
+
+
+def test_concurrent_searches(tmp_path, monkeypatch):
+    searcher = make_searcher(tmp_path, monkeypatch)
+    platform = searcher.get_platform(ToyDB.name)
+    assert platform._run_sql_query("SELECT COUNT(*) FROM articles")[0][0] == N_ARTICLES
+
+    actor = Actor(tools=[searcher], max_parallel_actions=2)
+    actions = [Search(query="First query", platform=ToyDB.name),
+               Search(query="Second query", platform=ToyDB.name)]
+
+    evidences = actor.perform(actions, summarize=False)
+
+    # The DB was queried in the main thread before but the searches ran in action threads
+    assert all(thread.startswith("action") for thread in platform.threads)
+    assert platform.n_searches == 2
+
+    # Each source is returned only once across both searches
+    assert not any(isinstance(evidence.raw, ErrorResults) for evidence in evidences)
+    urls = [source.url for evidence in evidences if evidence.raw is not None for source in evidence.raw.sources]
+    assert sorted(urls) == [f"https://example.com/{i}" for i in range(N_ARTICLES)]
+    assert searcher.n_retrieved_results == 2 * N_ARTICLES
+    assert searcher.n_unique_retrieved_results == N_ARTICLES
+
+
+def test_concurrent_forks(tmp_path, monkeypatch):
+    searcher = make_searcher(tmp_path, monkeypatch)
+    actor = Actor(tools=[searcher])
+    forks = [actor.fork() for _ in range(2)]
+
+    def search(fork: Actor, query: str):
+        return fork.perform([Search(query=query, platform=ToyDB.name)], summarize=False)[0]
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="question") as executor:
+        evidences = list(executor.map(search, forks, ["First query", "Second query"]))
+    for fork in forks:
+        actor.merge_stats(fork)
+
+    # The forks keep separate known sources, hence each retrieves all articles
+    assert all(len(evidence.raw.sources) == N_ARTICLES for evidence in evidences)
+    assert searcher.get_platform(ToyDB.name).n_searches == 2
+    assert searcher.n_unique_retrieved_results == 2 * N_ARTICLES
@@ -0,0 +1,37 @@
+from defame.common import Claim, Report, Label
+from defame.common.verdict_cache import VerdictCache, normalize_claim_text
+
+
+def make_report(text: str) -> Report:
+    doc = Report(Claim(text))
+    doc.add_reasoning("The sky appears blue due to Rayleigh scattering.")
+    doc.verdict = Label.SUPPORTED
+    return doc
+
+
+def test_normalize_claim_text():
+    assert normalize_claim_text('  "The sky is  BLUE." ') == "the sky is blue"
+
+
+def test_get_and_put(tmp_path):
+    cache = VerdictCache(tmp_path / "verdicts.db")
+    claim = Claim("The sky is blue.")
+    assert cache.get(claim, "config") is None
+
+    cache.put(claim, "config", make_report("The sky is blue."), dict(q_and_a=[]))
+    doc, meta, similarity = cache.get(Claim("the sky is  blue"), "config")
+    assert doc.verdict == Label.SUPPORTED
+    assert meta == dict(q_and_a=[])
+    assert similarity == 1
+
+    # Other configurations and claims don't match
+    assert cache.get(claim, "other config") is None
+    assert cache.get(Claim("The sky is green."), "config") is None
+
+
+def test_eviction(tmp_path):
+    cache = VerdictCache(tmp_path / "verdicts.db", max_entries=2)
+    for text in ["A", "B", "C"]:
+        cache.put(Claim(text), "config", make_report(text), dict())
+    assert len(cache) == 2
+    assert cache.get(Claim("A"), "config") is None
@@ -0,0 +1,39 @@
+"""Bridges synchronous code and coroutines. Async clients (like pooled HTTP clients)
+are bound to the event loop they were first used in. Therefore, each process keeps
+one persistent event loop running in a background thread on which all coroutines
+submitted from synchronous code are executed."""
+
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Returns this process's background event loop. Starts it if not running yet
+    (or if it did not survive a fork)."""
+    global _loop, _loop_thread, _loop_pid
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid() or not _loop_thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="BackgroundEventLoop", daemon=True)
+            _loop_thread.start()
+            _loop_pid = os.getpid()
+        return _loop
+
+
+def run_sync(coroutine: Coroutine) -> Any:
+    """Runs the coroutine on the background event loop and blocks until it
+    completes. Thread-safe, i.e., multiple threads may wait for their coroutines
+    concurrently."""
+    loop = get_background_loop()
+    if threading.current_thread() is _loop_thread:
+        coroutine.close()
+        raise RuntimeError("run_sync() must not be called from within the background event loop. "
+                           "Await the coroutine instead.")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
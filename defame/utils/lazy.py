@@ -0,0 +1,36 @@
+"""Helpers to defer expensive initialization until first use."""
+
+import threading
+from typing import Any, Callable
+
+
+class LazyObject:
+    """Stands in for an object (like a module-level singleton) which gets created by
+    `factory` only once it is used for the first time. All attribute accesses are
+    forwarded to the created object. Thread-safe."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _get_instance(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, "_instance", self._factory())
+        return self._instance
+
+    def is_initialized(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_instance(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._get_instance(), name, value)
+
+    def __repr__(self):
+        if self.is_initialized():
+            return repr(self._instance)
+        return f"LazyObject({getattr(self._factory, '__qualname__', self._factory)})"
@@ -0,0 +1,25 @@
+"""Caching of string representations which are expensive to build, like those of
+Reports, which get rendered for nearly every prompt."""
+
+
+class CachedStr:
+    """Mixin caching the string returned by `_render()`. Assigning any attribute
+    invalidates the cache. In-place changes (like appending to a list attribute)
+    do not, so they must be followed by a call to `invalidate()`."""
+
+    def _render(self) -> str:
+        raise NotImplementedError
+
+    def __str__(self):
+        rendered = self.__dict__.get("_rendered")
+        if rendered is None:
+            rendered = self._render()
+            self.__dict__["_rendered"] = rendered
+        return rendered
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        self.invalidate()
+
+    def invalidate(self):
+        self.__dict__.pop("_rendered", None)
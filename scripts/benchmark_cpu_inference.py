@@ -0,0 +1,39 @@
+"""Compares the generation speed of a small open model on the CPU with and without
+int8 dynamic quantization (and, optionally, ONNX Runtime). Needs no GPU."""
+
+import time
+
+from defame.common.modeling import make_model
+
+MODEL = "tinyllama"
+N_THREADS = None  # use the torch default
+ONNX_DIR = None  # set to a directory to also benchmark the ONNX export
+PROMPTS = [
+    "Summarize in one sentence: The Eiffel Tower was completed in 1889 for the World's Fair in Paris.",
+    "Is the following claim plausible? Answer briefly. 'Water boils at 50 degrees Celsius at sea level.'",
+    "Name the capital of Australia and give one fact about it.",
+]
+
+SETUPS = {
+    "float32": dict(cpu_inference=True, quantize=False),
+    "int8 dynamic": dict(cpu_inference=True, quantize=True),
+}
+if ONNX_DIR is not None:
+    SETUPS["onnx"] = dict(onnx_dir=ONNX_DIR)
+
+
+if __name__ == "__main__":
+    for setup, kwargs in SETUPS.items():
+        llm = make_model(MODEL, n_threads=N_THREADS, max_response_len=128, **kwargs)
+        llm.generate(PROMPTS[0])  # warm-up
+        llm.reset_stats()
+
+        start = time.time()
+        for prompt in PROMPTS:
+            llm.generate(prompt)
+        duration = time.time() - start
+
+        n_output_tokens = llm.get_stats()["Output tokens"]
+        print(f"{setup:<15} {duration / len(PROMPTS):6.2f} s/prompt    "
+              f"{n_output_tokens / duration:6.1f} output tokens/s")
+        del llm
@@ -0,0 +1,55 @@
+"""Measures how long it takes to import DEFAME's entry points in a fresh interpreter,
+i.e., the startup cost of each worker process and of the API frontend. Also reports
+which heavy third-party packages got imported along the way, which should not happen
+when using API-only models."""
+
+import subprocess
+import sys
+import time
+
+MODULES = [
+    "defame.common",
+    "defame.common.modeling",
+    "defame.fact_checker",
+    "defame.helpers.parallelization.pool",
+    "defame.helpers.api.main",
+]
+
+HEAVY_PACKAGES = ["torch", "transformers", "sentence_transformers", "sklearn", "pandas", "google.cloud.vision"]
+
+N_REPETITIONS = 3
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+loaded = [p for p in {heavy!r} if p in sys.modules]
+print(f"{{duration}}|{{','.join(loaded)}}")
+"""
+
+
+def measure(module: str) -> tuple[float, list[str]]:
+    """Imports the module in a new interpreter, returns the import time in seconds
+    and the heavy packages that got loaded."""
+    probe = PROBE.format(module=module, heavy=HEAVY_PACKAGES)
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    duration, loaded = result.stdout.strip().splitlines()[-1].split("|")
+    return float(duration), [p for p in loaded.split(",") if p]
+
+
+if __name__ == "__main__":
+    print(f"Import times (best of {N_REPETITIONS}):")
+    start = time.time()
+    for module in MODULES:
+        try:
+            results = [measure(module) for _ in range(N_REPETITIONS)]
+        except RuntimeError as e:
+            print(e)
+            continue
+        best = min(duration for duration, _ in results)
+        loaded = results[0][1]
+        print(f"{module:<40} {best:6.2f} s    heavy imports: {', '.join(loaded) if loaded else 'none'}")
+    print(f"Total benchmark time: {time.time() - start:.1f} s")
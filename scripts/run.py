@@ -2,10 +2,13 @@
 
 from ezmm import Image
 
-from defame.fact_checker import FactChecker, RateLimitedFactChecker
+from defame.fact_checker import FactChecker
 
-fact_checker = RateLimitedFactChecker(
-  llm="gpt_4o", 
+fact_checker = FactChecker(
+  llm="gpt_4o",
+  llm_kwargs={
+      "tpm_limit": 18000  # shared by all processes on this machine
+  },
   max_result_len=1200,
   max_iterations=3,
   tools_config={
@@ -18,5 +21,5 @@ fact_checker = RateLimitedFactChecker(
 claim = ["The image",
          Image("in/example/Myanmar.png"),
          "shows the beautiful fields in Myanmar"]
-report, _ = fact_checker.verify_claim_with_rate_limit(claim)
+report, _ = fact_checker.verify_claim(claim)
 report.save_to("out/fact-check")
@@ -2,9 +2,9 @@
 
 from ezmm import Image
 
-from defame.fact_checker import FactChecker, RateLimitedFactChecker
+from defame.fact_checker import FactChecker
 '''
-fact_checker = RateLimitedFactChecker(llm="gpt_4o", tools_config={
+fact_checker = FactChecker(llm="gpt_4o", llm_kwargs={"tpm_limit": 18000}, tools_config={
         "searcher": None,  # default
         "geolocator": None  # default
     })'''